@@ -1,17 +1,32 @@
 #! /usr/bin/env python3
 import argparse
+import contextlib
 import csv
+import functools
+import glob
+import json
+import multiprocessing
 import os
 import pathlib
-from typing import Iterable, List, Optional, Sequence, Tuple
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple, TypeVar
 
 import cairo
-import numpy as np
 
+import file_watch
+import fonts
 import layout
-from card_model import CardDeck, CardModel
+import profiling
+from card_model import CardDeck, CardModel, CardRecord
 from draw_card import drawCard
-from utils import slugify
+from png_writer import MAX_COMPRESSION, MIN_COMPRESSION, PngWriter, write_png
+from render_cache import RenderCache, TileStore, atlas_digest, card_digest, card_output_digest, page_digest
+from surface_cache import SurfaceCache, SurfacePool
+from utils import SOURCE_IMAGES_DIR, atomic_write, slugify
 
 
 def extant_file(path: str) -> str:
@@ -21,16 +36,89 @@ def extant_file(path: str) -> str:
     return path
 
 
+def job_count(value: str) -> int:
+    """Validate the number of worker processes; ``0`` means one per CPU."""
+    try:
+        jobs = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{value} is not a valid number of jobs")
+
+    if jobs < 0:
+        raise argparse.ArgumentTypeError("the number of jobs cannot be negative")
+
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+    return jobs
+
+
+def expand_deck_files(patterns: Sequence[str]) -> List[str]:
+    """Expand glob patterns into deck files, keeping their order and dropping repeats."""
+    deck_files: List[str] = []
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            matches = sorted(glob.glob(pattern))
+            if not matches:
+                raise argparse.ArgumentTypeError(f'no deck matches {pattern}')
+        else:
+            matches = [extant_file(pattern)]
+
+        for match in matches:
+            if match not in deck_files:
+                deck_files.append(match)
+
+    stems = [pathlib.Path(deck_file).stem for deck_file in deck_files]
+    for stem in set(stems):
+        if stems.count(stem) > 1:
+            raise argparse.ArgumentTypeError(f'several decks are named {stem}; their output directories would collide')
+
+    return deck_files
+
+
+def atlas_grid(value: str) -> Tuple[int, int]:
+    """Parse an atlas grid such as ``10x7`` into ``(columns, rows)``."""
+    columns, separator, rows = value.lower().partition('x')
+    try:
+        grid = (int(columns), int(rows))
+    except ValueError:
+        grid = (0, 0)
+    if (not separator) or min(grid) < 1:
+        raise argparse.ArgumentTypeError(f'atlas grid must look like COLSxROWS, e.g. 10x7, got {value}')
+    return grid
+
+
+def png_compression_level(value: str) -> int:
+    level = int(value)
+    if not MIN_COMPRESSION <= level <= MAX_COMPRESSION:
+        raise argparse.ArgumentTypeError(
+            f'compression level must be between {MIN_COMPRESSION} and {MAX_COMPRESSION}, got {value}'
+        )
+    return level
+
+
+DEFAULT_ATLAS_DPI = 150
+PREVIEW_DPI = 75
+
+
 def parse_arguments() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Deck Generator for Game Designers")
-    parser.add_argument('-d', '--deck', type=extant_file, help='csv file containing the deck', metavar="FILE")
+    parser.add_argument('-d', '--deck', nargs='+', help='csv files containing the decks; glob patterns such as "decks/*.csv" are expanded', metavar="FILE")
     parser.add_argument('-c', '--cards', type=extant_file, help='json file containing cards description', metavar="FILE", required=True)
 
     parser.add_argument('-i', '--images', help='Add images to cards', action='store_true')
     parser.add_argument('-r', '--rgb', help='Update layout card border colour with given R,G,B, only works with default layout', nargs=3, type=int)
-    parser.add_argument('-l', '--layout', help='Use a different layout than default', type=extant_file, metavar="FILE")
+    parser.add_argument('-l', '--layout', help='Use a different layout PNG than default', type=extant_file, metavar="FILE")
     parser.add_argument('--single-card', help='Render each card as an individual 63x85mm PNG at 300 DPI', action='store_true')
     parser.add_argument('-o', '--output-dir', help='Directory where generated decks will be stored', default='decks')
+    parser.add_argument('--no-cache', help='Render everything again instead of reusing the render cache stored in the output directory', action='store_true')
+    parser.add_argument('-j', '--jobs', help='Number of worker processes used to render pages or cards (0 uses every CPU)', type=job_count, default=1, metavar='N')
+    parser.add_argument('-f', '--format', help='Write PNG images or a single multi-page vector PDF per deck', choices=('png', 'pdf'), default='png')
+    parser.add_argument('--atlas', help=f'Write each unique card once into sheets of COLSxROWS cells plus a JSON index, for virtual tabletop imports; cells are drawn at --dpi, {DEFAULT_ATLAS_DPI} by default', type=atlas_grid, metavar='COLSxROWS')
+    resolution = parser.add_mutually_exclusive_group()
+    resolution.add_argument('--dpi', help=f'Render at this resolution instead of the layout PNG\'s (pages), {layout.SINGLE_CARD_DPI} (--single-card) or {DEFAULT_ATLAS_DPI} (--atlas)', type=int, metavar='DPI')
+    resolution.add_argument('--preview', help=f'Quick low-resolution draft, the same as --dpi {PREVIEW_DPI}', action='store_true')
+    parser.add_argument('-w', '--watch', help='Keep running and re-render the cards and pages affected by each change to the cards, deck, layout or images', action='store_true')
+    parser.add_argument('--profile', help='Record how long each stage, page and card takes and save it as a Chrome trace JSON file', metavar='FILE')
+    parser.add_argument('--png-compression', help='zlib level used for PNG files, from 0 (fastest, largest) to 9 (smallest); cairo\'s default when omitted', type=png_compression_level, metavar='LEVEL')
 
     args = parser.parse_args()
 
@@ -40,10 +128,31 @@ def parse_arguments() -> argparse.Namespace:
     if (not args.single_card) and args.deck is None:
         parser.error('the --deck/-d option is required unless --single-card is specified')
 
+    if args.deck is not None:
+        try:
+            args.deck = expand_deck_files(args.deck)
+        except argparse.ArgumentTypeError as error:
+            parser.error(str(error))
+
+    if args.atlas is not None and args.format == 'pdf':
+        parser.error('the --atlas option writes PNG sheets and cannot be used with --format pdf')
+
+    if args.dpi is not None and args.dpi < 1:
+        parser.error('the --dpi option must be a positive number')
+
+    if args.preview:
+        args.dpi = PREVIEW_DPI
+
+    if args.dpi is not None and args.format == 'pdf':
+        parser.error('PDF output is vector and cannot be used with --dpi or --preview')
+
+    if args.watch and args.no_cache:
+        parser.error('the --watch option relies on the render cache and cannot be used with --no-cache')
+
     return args
 
 
-def chunk_cards(cards: Sequence[CardModel], chunk_size: int = 9) -> Iterable[List[CardModel]]:
+def chunk_cards(cards: Sequence[CardRecord], chunk_size: int = 9) -> Iterable[List[CardRecord]]:
     for index in range(0, len(cards), chunk_size):
         yield list(cards[index:index + chunk_size])
 
@@ -56,28 +165,36 @@ def _require_image_helpers(*helpers) -> None:
         )
 
 
+def deck_card_names(deck_file: str) -> Set[str]:
+    """Return the card names referenced by a deck CSV."""
+    with open(deck_file, encoding='utf-8') as csv_file:
+        reader = csv.reader(csv_file)
+        next(reader, None)
+        return {row[1] for row in reader if len(row) > 1}
+
+
 def build_card_list(
     *,
     cards: CardDeck,
     cards_file: str,
     deck_file: Optional[str],
     single_card_mode: bool,
-) -> Tuple[str, List[CardModel], Optional[List[Sequence[str]]]]:
+) -> Tuple[str, List[CardRecord], Optional[List[Sequence[str]]]]:
+    """Expand the deck into one entry per copy."""
     card_db = cards.getDb()
 
     if single_card_mode:
         deck_name = pathlib.Path(cards_file).stem
-        card_list: List[CardModel] = []
+        card_list: List[CardRecord] = []
         for entry in card_db.values():
             card = CardModel()
             card.load(entry)
-            card_list.append(card)
+            card_list.append(card.compile())
         return deck_name, card_list, None
 
     assert deck_file is not None
     deck_path = pathlib.Path(deck_file)
     deck_name = deck_path.stem
-    card_list: List[CardModel] = []
     deck_rows: List[Sequence[str]] = []
 
     with deck_path.open(encoding='utf-8') as csv_file:
@@ -86,18 +203,32 @@ def build_card_list(
         try:
             header = next(reader)
         except StopIteration:
-            return deck_name, card_list, deck_rows
+            return deck_name, [], deck_rows
 
         deck_rows.append(header)
+        deck_rows.extend(reader)
+
+    return deck_name, expand_deck_rows(deck_rows[1:], card_db), deck_rows
+
 
-        for row in reader:
-            deck_rows.append(row)
-            quantity = int(row[0])
-            name = row[1]
-            for _ in range(quantity):
-                card_list.append(CardModel(name, card_db))
+def expand_deck_rows(rows: Iterable[Sequence], card_db) -> List[CardRecord]:
+    """Expand ``(quantity, name)`` rows into one entry per copy.
 
-    return deck_name, card_list, deck_rows
+    Every copy of a card refers to the same immutable ``CardRecord``.
+    """
+    card_list: List[CardRecord] = []
+    records: Dict[str, CardRecord] = {}
+
+    for row in rows:
+        quantity = int(row[0])
+        name = row[1]
+        record = records.get(name)
+        if record is None:
+            record = CardModel(name, card_db).compile()
+            records[name] = record
+        card_list.extend([record] * quantity)
+
+    return card_list
 
 
 def ensure_output_directories(
@@ -116,26 +247,258 @@ def ensure_output_directories(
     return deck_dir, cards_output_dir
 
 
+_Task = TypeVar('_Task')
+_Result = TypeVar('_Result')
+
+
+def run_jobs(
+    worker: Callable[[_Task], _Result],
+    tasks: Iterable[_Task],
+    jobs: int = 1,
+) -> Iterator[_Result]:
+    """Run ``worker`` over ``tasks`` and yield the results in task order.
+
+    With ``jobs`` greater than one the tasks are handed to a process pool;
+    ``worker`` and every task must then be picklable.
+    """
+    if jobs <= 1:
+        for task in tasks:
+            yield worker(task)
+        return
+
+    global _SHARED_POOL
+    shared = _SHARED_POOL
+    if shared is None or shared[0] != jobs:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            yield from _map_jobs(executor, worker, tasks)
+        return
+
+    try:
+        yield from _map_jobs(shared[1], worker, tasks)
+    except BrokenProcessPool:
+        # A crashed worker breaks the pool for good; later calls get a new one.
+        shared[1].shutdown()
+        _SHARED_POOL = (jobs, ProcessPoolExecutor(max_workers=jobs))
+        raise
+
+
+def _map_jobs(executor: ProcessPoolExecutor, worker, tasks) -> Iterator:
+    if not profiling.is_enabled():
+        yield from executor.map(worker, tasks)
+        return
+
+    # Workers send their trace events back with each result.
+    for result, events in executor.map(functools.partial(profiling.call_collecting, worker), tasks):
+        profiling.add_events(events)
+        yield result
+
+
+# Worker pool reused by run_jobs inside shared_worker_pool(), with its size.
+_SHARED_POOL: Optional[Tuple[int, ProcessPoolExecutor]] = None
+
+
+@contextlib.contextmanager
+def shared_worker_pool(jobs: int) -> Iterator[None]:
+    """Let every ``run_jobs`` call in the block reuse one pool of ``jobs`` workers.
+
+    The workers keep their caches warm between calls, e.g. across the
+    re-renders of watch mode.
+    """
+    global _SHARED_POOL
+    if jobs <= 1 or _SHARED_POOL is not None:
+        yield
+        return
+
+    _SHARED_POOL = (jobs, ProcessPoolExecutor(max_workers=jobs))
+    try:
+        yield
+    finally:
+        _SHARED_POOL[1].shutdown()
+        _SHARED_POOL = None
+
+
+def single_card_path(cards_output_dir: pathlib.Path, index: int, card: CardRecord) -> pathlib.Path:
+    return cards_output_dir / f"{index:03d}_{slugify(card.headerText)}.png"
+
+
+def deck_page_path(deck_dir: pathlib.Path, deck_name: str, page_number: int) -> pathlib.Path:
+    return deck_dir / f'{deck_name}_p{page_number}.png'
+
+
+# Page, card and atlas surfaces written to disk, reused once they are encoded.
+_SURFACES = SurfacePool()
+
+
+def _write_output(
+    surface: cairo.ImageSurface,
+    output_path: pathlib.Path,
+    png_compression: Optional[int],
+    png_writer: Optional[PngWriter],
+    pool: Optional[SurfacePool] = None,
+) -> None:
+    release = pool.release if pool is not None else None
+    if png_writer is not None:
+        png_writer.submit(surface, output_path, release)
+        return
+
+    try:
+        write_png(surface, output_path, png_compression)
+    finally:
+        if release is not None:
+            release(surface)
+
+
+def _render_single_card(
+    task: Tuple[int, CardRecord],
+    *,
+    deck_name: str,
+    cards_output_dir: pathlib.Path,
+    output_root: pathlib.Path,
+    handle_images: bool,
+    process_image_fn,
+    load_art_surface_fn,
+    load_full_frame_surface_fn,
+    dpi: float = layout.SINGLE_CARD_DPI,
+    png_compression: Optional[int] = None,
+    png_writer: Optional[PngWriter] = None,
+) -> pathlib.Path:
+    index, card = task
+
+    surf = render_card_tile(
+        card,
+        dpi,
+        deck_name=deck_name,
+        output_root=output_root,
+        handle_images=handle_images,
+        process_image_fn=process_image_fn,
+        load_art_surface_fn=load_art_surface_fn,
+        load_full_frame_surface_fn=load_full_frame_surface_fn,
+        pool=_SURFACES,
+    )
+
+    output_path = single_card_path(cards_output_dir, index, card)
+    _write_output(surf, output_path, png_compression, png_writer, _SURFACES)
+
+    return output_path
+
+
 def render_single_cards(
-    card_list: Sequence[CardModel],
+    card_list: Sequence[CardRecord],
     *,
     deck_name: str,
     cards_output_dir: pathlib.Path,
     output_root: pathlib.Path,
     handle_images: bool,
-    base_image_cls,
-    add_image_fn,
     process_image_fn,
+    load_art_surface_fn,
     load_full_frame_surface_fn,
+    dpi: float = layout.SINGLE_CARD_DPI,
+    jobs: int = 1,
+    render_cache: Optional[RenderCache] = None,
+    png_compression: Optional[int] = None,
 ) -> None:
-    single_dpi = layout.SINGLE_CARD_DPI
+    worker = functools.partial(
+        _render_single_card,
+        deck_name=deck_name,
+        cards_output_dir=cards_output_dir,
+        output_root=output_root,
+        handle_images=handle_images,
+        process_image_fn=process_image_fn,
+        load_art_surface_fn=load_art_surface_fn,
+        load_full_frame_surface_fn=load_full_frame_surface_fn,
+        dpi=dpi,
+        png_compression=png_compression,
+    )
+
+    tasks = list(enumerate(card_list))
+    digests = {}
+
+    if render_cache is not None:
+        pending = []
+        for index, card in tasks:
+            digests[index] = card_output_digest(
+                card_digest(card, dpi, handle_images=handle_images, fingerprint=render_cache.fingerprint),
+                png_compression=png_compression,
+            )
+            output_path = single_card_path(cards_output_dir, index, card)
+            if not render_cache.outputs.is_current(output_path, digests[index]):
+                pending.append((index, card))
+
+        if len(pending) < len(tasks):
+            print(f'{len(tasks) - len(pending)} cards are up to date')
+        tasks = pending
+
+    # Sequential runs encode PNGs on a background thread while the next card
+    # is drawn; worker processes already overlap encoding with each other.
+    with (PngWriter(png_compression) if jobs <= 1 else contextlib.nullcontext()) as png_writer:
+        if png_writer is not None:
+            worker = functools.partial(worker, png_writer=png_writer)
+
+        for (index, card), output_path in zip(tasks, run_jobs(worker, tasks, jobs)):
+            print(f'Card {index}: {card}')
+            if render_cache is not None:
+                render_cache.outputs.record(output_path, digests[index])
+
+    if render_cache is not None:
+        render_cache.outputs.save()
+
+
+_CARD_TILES = SurfaceCache()
 
-    for index, card in enumerate(card_list):
-        print(f'Card {index}: {card}')
-        surf = layout.get_single_card_surface(single_dpi)
-        ctx = cairo.Context(surf)
 
-        card_matrix = layout.get_single_card_matrix(single_dpi)
+def render_card_tile(
+    card: CardRecord,
+    dpi: float,
+    *,
+    deck_name: str,
+    output_root: pathlib.Path,
+    handle_images: bool,
+    process_image_fn,
+    load_art_surface_fn,
+    load_full_frame_surface_fn,
+    pool: Optional[SurfacePool] = None,
+) -> cairo.ImageSurface:
+    """Rasterise a single card, including its artwork, on a transparent tile.
+
+    With ``pool`` the tile is a pooled surface the caller must release.
+    """
+    tile = layout.get_single_card_surface(dpi, pool)
+    try:
+        draw_card_tile(
+            cairo.Context(tile),
+            card,
+            dpi,
+            deck_name=deck_name,
+            output_root=output_root,
+            handle_images=handle_images,
+            process_image_fn=process_image_fn,
+            load_art_surface_fn=load_art_surface_fn,
+            load_full_frame_surface_fn=load_full_frame_surface_fn,
+        )
+    except BaseException:
+        if pool is not None:
+            pool.release(tile)
+        raise
+    return tile
+
+
+def draw_card_tile(
+    ctx: cairo.Context,
+    card: CardRecord,
+    dpi: float,
+    *,
+    origin_px: Tuple[int, int] = (0, 0),
+    deck_name: str,
+    output_root: pathlib.Path,
+    handle_images: bool,
+    process_image_fn,
+    load_art_surface_fn,
+    load_full_frame_surface_fn,
+) -> None:
+    """Draw a card with its artwork on a raster context, its top-left corner at ``origin_px``."""
+    with profiling.span('card', 'card', card=str(card), dpi=dpi):
+        ctx.save()
+        card_matrix = layout.get_single_card_matrix(dpi, origin_px)
         ctx.set_matrix(card_matrix)
         layout.clip_card(ctx)
         if card.imageFullFrame:
@@ -144,156 +507,644 @@ def render_single_cards(
 
         if handle_images and card.imageFullFrame:
             _require_image_helpers(load_full_frame_surface_fn)
-            full_frame_surface = load_full_frame_surface_fn(card, single_dpi)
+            with profiling.span('loadArt', 'image'):
+                full_frame_surface = load_full_frame_surface_fn(card, dpi, output_root=output_root)
             if full_frame_surface is not None:
-                ctx.save()
                 ctx.identity_matrix()
-                ctx.set_source_surface(full_frame_surface, 0, 0)
+                ctx.set_source_surface(full_frame_surface, *origin_px)
                 ctx.paint()
-                ctx.restore()
+        ctx.restore()
 
-        ctx.reset_clip()
+        ctx.save()
         ctx.set_matrix(card_matrix)
-        drawCard(card, ctx)
+        with profiling.span('drawCard', 'draw'):
+            drawCard(card, ctx)
+        ctx.restore()
+
+        if handle_images and card.image is not None and not card.imageFullFrame:
+            _require_image_helpers(process_image_fn, load_art_surface_fn)
+            with profiling.span('processImage', 'image'):
+                image_path = process_image_fn(card, deck_name, dpi=dpi, output_root=output_root)
+            art_surface = None
+            if image_path is not None:
+                with profiling.span('loadArt', 'image'):
+                    art_surface = load_art_surface_fn(
+                        card, deck_name, dpi=dpi, output_root=output_root, image_path=image_path
+                    )
+            if art_surface is not None:
+                art_offset_px = layout.pair_mm_to_pixels(layout.ART_OFFSET_MM, dpi)
+                with profiling.span('composite', 'draw'):
+                    ctx.save()
+                    ctx.identity_matrix()
+                    ctx.set_source_surface(
+                        art_surface,
+                        origin_px[0] + art_offset_px[0],
+                        origin_px[1] + art_offset_px[1],
+                    )
+                    ctx.paint()
+                    ctx.restore()
 
-        card_filename = f"{index:03d}_{slugify(card.headerText)}.png"
-        output_path = cards_output_dir / card_filename
-        surf.write_to_png(str(output_path))
 
-        if handle_images and not card.imageFullFrame:
-            _require_image_helpers(
-                base_image_cls,
-                add_image_fn,
-                process_image_fn,
-            )
-            process_image_fn(card, deck_name, dpi=single_dpi, output_root=output_root)
-            base_image = base_image_cls(str(output_path))
-            updated_image = add_image_fn(
+def get_card_tile(
+    card: CardRecord,
+    dpi: float,
+    *,
+    handle_images: bool,
+    tile_store: Optional[TileStore] = None,
+    **render_options,
+) -> cairo.ImageSurface:
+    """Return the tile for ``card`` at ``dpi``, rendering it on first use.
+
+    Tiles are kept in memory for the current process. When ``tile_store`` is
+    given, tiles with art are also kept on disk so later runs can reuse them;
+    text-only tiles are about as cheap to redraw as to decode, so they are not
+    written.
+    """
+    if tile_store is None:
+        key = (card.render_key(), dpi, handle_images)
+    else:
+        key = card_digest(card, dpi, handle_images=handle_images, fingerprint=tile_store.fingerprint)
+
+    persist = tile_store is not None and handle_images and card.image is not None
+
+    def render() -> cairo.ImageSurface:
+        tile = tile_store.load(key) if persist else None
+        if tile is None:
+            tile = render_card_tile(card, dpi, handle_images=handle_images, **render_options)
+            if persist:
+                tile_store.store(key, tile)
+        return tile
+
+    return _CARD_TILES.get_or_render(key, render)
+
+
+def compose_deck_page(
+    page: Sequence[CardRecord],
+    *,
+    deck_name: str,
+    output_root: pathlib.Path,
+    handle_images: bool,
+    modify_layout: Optional[Sequence[int]],
+    process_image_fn,
+    load_art_surface_fn,
+    load_full_frame_surface_fn,
+    layout_path: Optional[str] = None,
+    tile_store: Optional[TileStore] = None,
+    dpi: Optional[float] = None,
+    pool: Optional[SurfacePool] = None,
+) -> cairo.ImageSurface:
+    """Return a page surface with up to nine cards placed on the layout grid.
+
+    ``dpi`` renders the page at that resolution instead of the layout PNG's.
+    With ``pool`` the page is a pooled surface the caller must release.
+    """
+    with profiling.span('copyLayout', 'layout'):
+        surf = layout.getSurface(modify_layout, layout_path, dpi, pool)
+    ctx = cairo.Context(surf)
+
+    # A resampled page is only about ``dpi`` wide, so use the requested value.
+    page_dpi = dpi if dpi is not None else layout.get_surface_dpi(surf)
+
+    try:
+        for index, card in enumerate(page):
+            card_pos = (index % 3, index // 3)
+            tile = get_card_tile(
                 card,
-                base_image,
-                deck_name,
-                dpi=single_dpi,
+                page_dpi,
+                deck_name=deck_name,
                 output_root=output_root,
+                handle_images=handle_images,
+                process_image_fn=process_image_fn,
+                load_art_surface_fn=load_art_surface_fn,
+                load_full_frame_surface_fn=load_full_frame_surface_fn,
+                tile_store=tile_store,
             )
-            base_image.update(updated_image)
-            base_image.save(str(output_path))
+            origin_px = layout.pair_mm_to_pixels(layout.get_card_origin_mm(card_pos), page_dpi)
+            with profiling.span('composite', 'draw'):
+                ctx.set_source_surface(tile, *origin_px)
+                ctx.paint()
+    except BaseException:
+        if pool is not None:
+            pool.release(surf)
+        raise
 
+    return surf
 
-def _apply_layout_colour_modification(
+
+def _render_deck_page(
+    task: Tuple[str, pathlib.Path, int, List[CardRecord]],
     *,
-    base_image,
-    modify_layout: Sequence[int],
-) -> None:
-    from PIL import Image
-
-    temp = base_image.baseImage.convert('RGBA')
-    data = np.array(temp)
-    red, green, blue, alpha = data.T
-    for i in range(0, 63):
-        white_areas = (red == 190 + i) & (blue == 190 + i) & (green == 190 + i)
-        data[..., :-1][white_areas.T] = (
-            modify_layout[0],
-            modify_layout[1],
-            modify_layout[2],
+    output_root: pathlib.Path,
+    handle_images: bool,
+    modify_layout: Optional[Sequence[int]],
+    process_image_fn,
+    load_art_surface_fn,
+    load_full_frame_surface_fn,
+    layout_path: Optional[str] = None,
+    tile_store: Optional[TileStore] = None,
+    dpi: Optional[float] = None,
+    png_compression: Optional[int] = None,
+    png_writer: Optional[PngWriter] = None,
+) -> pathlib.Path:
+    deck_name, deck_dir, page_number, page = task
+
+    with profiling.span('page', 'page', deck=deck_name, page=page_number):
+        surf = compose_deck_page(
+            page,
+            deck_name=deck_name,
+            output_root=output_root,
+            handle_images=handle_images,
+            modify_layout=modify_layout,
+            process_image_fn=process_image_fn,
+            load_art_surface_fn=load_art_surface_fn,
+            load_full_frame_surface_fn=load_full_frame_surface_fn,
+            layout_path=layout_path,
+            tile_store=tile_store,
+            dpi=dpi,
+            pool=_SURFACES,
         )
-    base_image.update(Image.fromarray(data))
+
+        output_path = deck_page_path(deck_dir, deck_name, page_number)
+        _write_output(surf, output_path, png_compression, png_writer, _SURFACES)
+
+        return output_path
+
+
+def link_or_copy(source: pathlib.Path, destination: pathlib.Path) -> None:
+    """Make ``destination`` a hard link to ``source``, or a copy where links are unsupported."""
+    with atomic_write(destination) as temporary:
+        try:
+            os.link(source, temporary)
+        except OSError:
+            shutil.copyfile(source, temporary)
+
+
+class DeckJob(NamedTuple):
+    name: str
+    directory: pathlib.Path
+    cards: Sequence[CardRecord]
 
 
 def render_deck_pages(
-    card_list: Sequence[CardModel],
+    card_list: Sequence[CardRecord],
     *,
     deck_name: str,
     deck_dir: pathlib.Path,
+    **render_options,
+) -> None:
+    render_decks([DeckJob(deck_name, deck_dir, card_list)], **render_options)
+
+
+def render_decks(
+    decks: Sequence[DeckJob],
+    *,
     output_root: pathlib.Path,
     handle_images: bool,
     modify_layout: Optional[Sequence[int]],
-    base_image_cls,
-    add_image_fn,
     process_image_fn,
+    load_art_surface_fn,
     load_full_frame_surface_fn,
+    layout_path: Optional[str] = None,
+    dpi: Optional[float] = None,
+    jobs: int = 1,
+    render_cache: Optional[RenderCache] = None,
+    png_compression: Optional[int] = None,
 ) -> None:
-    for page_number, page in enumerate(chunk_cards(card_list)):
-        print(f'Page {page_number}:')
-        surf = layout.getSurface()
-        ctx = cairo.Context(surf)
+    """Render the pages of every deck, sharing one worker pool and every cache.
+
+    Pages of all decks are queued together, so a batch keeps every worker
+    busy instead of waiting for the last page of each deck. Pages holding
+    the same cards in the same order are drawn and encoded once; the other
+    copies are hard links to (or copies of) that file.
+    """
+    worker = functools.partial(
+        _render_deck_page,
+        output_root=output_root,
+        handle_images=handle_images,
+        modify_layout=modify_layout,
+        process_image_fn=process_image_fn,
+        load_art_surface_fn=load_art_surface_fn,
+        load_full_frame_surface_fn=load_full_frame_surface_fn,
+        layout_path=layout_path,
+        tile_store=render_cache.tiles if render_cache is not None else None,
+        dpi=dpi,
+        png_compression=png_compression,
+    )
 
-        page_dpi = layout.get_surface_dpi(surf)
+    # Decoding the template here also lets forked workers inherit it.
+    template = layout.get_template(modify_layout, layout_path, dpi)
+    page_dpi = dpi if dpi is not None else layout.get_surface_dpi(template)
+
+    tasks = [
+        (deck.name, deck.directory, page_number, page)
+        for deck in decks
+        for page_number, page in enumerate(chunk_cards(deck.cards))
+    ]
+    digests = {}
+
+    if render_cache is not None:
+        # Copies share one record, so each distinct card is hashed once.
+        record_digests: Dict[int, str] = {}
+        for deck in decks:
+            for card in deck.cards:
+                if id(card) not in record_digests:
+                    record_digests[id(card)] = card_digest(
+                        card,
+                        page_dpi,
+                        handle_images=handle_images,
+                        fingerprint=render_cache.fingerprint,
+                    )
 
-        for index, card in enumerate(page):
-            card_pos = (index % 3, index // 3)
-            print(card_pos)
-            print(card)
+        for deck_name, deck_dir, page_number, page in tasks:
+            digests[deck_page_path(deck_dir, deck_name, page_number)] = page_digest(
+                [record_digests[id(card)] for card in page],
+                template_path=layout_path or layout.DEFAULT_LAYOUT_PATH,
+                modify_layout=modify_layout,
+                png_compression=png_compression,
+            )
 
-            if handle_images and card.imageFullFrame:
-                _require_image_helpers(load_full_frame_surface_fn)
-                full_frame_surface = load_full_frame_surface_fn(card, page_dpi)
-                if full_frame_surface is not None:
-                    card_origin_mm = layout.get_card_origin_mm(card_pos)
-                    origin_px = layout.pair_mm_to_pixels(card_origin_mm, page_dpi)
-                    ctx.save()
-                    ctx.identity_matrix()
-                    layout.clip_card_absolute(ctx, card_origin_mm, page_dpi)
-                    ctx.set_source_surface(full_frame_surface, *origin_px)
-                    ctx.paint()
-                    ctx.restore()
+    def is_current(output_path: pathlib.Path) -> bool:
+        return render_cache is not None and render_cache.outputs.is_current(output_path, digests[output_path])
+
+    # Group identical pages by the content of their cards, in page order.
+    groups: Dict[tuple, list] = {}
+    for task in tasks:
+        groups.setdefault(tuple(card.render_key() for card in task[3]), []).append(task)
+
+    pending = []
+    duplicates: List[Tuple[pathlib.Path, pathlib.Path]] = []
+    up_to_date = 0
+    for members in groups.values():
+        paths = [deck_page_path(deck_dir, deck_name, page_number) for deck_name, deck_dir, page_number, _ in members]
+        stale = [index for index, output_path in enumerate(paths) if not is_current(output_path)]
+        up_to_date += len(members) - len(stale)
+        if not stale:
+            continue
+
+        if len(stale) < len(members):
+            source = paths[next(index for index in range(len(members)) if index not in stale)]
+        else:
+            source = paths[stale[0]]
+            pending.append(members[stale.pop(0)])
+        duplicates.extend((source, paths[index]) for index in stale)
+
+    if up_to_date:
+        print(f'{up_to_date} pages are up to date')
+    task_order = {id(task): position for position, task in enumerate(tasks)}
+    tasks = sorted(pending, key=lambda task: task_order[id(task)])
+
+    with (PngWriter(png_compression) if jobs <= 1 else contextlib.nullcontext()) as png_writer:
+        if png_writer is not None:
+            worker = functools.partial(worker, png_writer=png_writer)
+
+        current_deck = None
+        for (deck_name, _, page_number, page), output_path in zip(tasks, run_jobs(worker, tasks, jobs)):
+            if len(decks) > 1 and deck_name != current_deck:
+                print(f'Deck {deck_name}:')
+                current_deck = deck_name
+            print(f'Page {page_number}:')
+            for index, card in enumerate(page):
+                print((index % 3, index // 3))
+                print(card)
+            if render_cache is not None:
+                render_cache.outputs.record(output_path, digests[output_path])
+
+    # The writer has finished, so every source page exists on disk.
+    for source, output_path in duplicates:
+        link_or_copy(source, output_path)
+        if render_cache is not None:
+            render_cache.outputs.record(output_path, digests[output_path])
+    if duplicates:
+        print(f'{len(duplicates)} identical pages reused without drawing')
+
+    if render_cache is not None:
+        render_cache.outputs.save()
+
+
+def atlas_sheet_path(deck_dir: pathlib.Path, deck_name: str, sheet_number: int) -> pathlib.Path:
+    return deck_dir / f'{deck_name}_atlas{sheet_number}.png'
+
+
+def _render_atlas_sheet(
+    task: Tuple[int, List[CardRecord]],
+    *,
+    columns: int,
+    rows: int,
+    dpi: int,
+    deck_name: str,
+    deck_dir: pathlib.Path,
+    output_root: pathlib.Path,
+    handle_images: bool,
+    process_image_fn,
+    load_art_surface_fn,
+    load_full_frame_surface_fn,
+    png_compression: Optional[int] = None,
+    png_writer: Optional[PngWriter] = None,
+) -> pathlib.Path:
+    sheet_number, cards = task
+    cell_px = layout.pair_mm_to_pixels((layout.CARD_WIDTH_MM, layout.CARD_HEIGHT_MM), dpi)
+
+    with profiling.span('sheet', 'page', deck=deck_name, sheet=sheet_number):
+        # Every sheet keeps the full grid so importers can rely on its size.
+        sheet = _SURFACES.acquire(columns * cell_px[0], rows * cell_px[1])
+        ctx = cairo.Context(sheet)
+        try:
+            for cell, card in enumerate(cards):
+                draw_card_tile(
+                    ctx,
+                    card,
+                    dpi,
+                    origin_px=((cell % columns) * cell_px[0], (cell // columns) * cell_px[1]),
+                    deck_name=deck_name,
+                    output_root=output_root,
+                    handle_images=handle_images,
+                    process_image_fn=process_image_fn,
+                    load_art_surface_fn=load_art_surface_fn,
+                    load_full_frame_surface_fn=load_full_frame_surface_fn,
+                )
+        except BaseException:
+            _SURFACES.release(sheet)
+            raise
 
-            mat = layout.getMatrix(*card_pos, surf)
-            ctx.set_matrix(mat)
-            drawCard(card, ctx)
+        output_path = atlas_sheet_path(deck_dir, deck_name, sheet_number)
+        _write_output(sheet, output_path, png_compression, png_writer, _SURFACES)
 
-        output_path = deck_dir / f'{deck_name}_p{page_number}.png'
-        surf.write_to_png(str(output_path))
+    return output_path
 
-        if modify_layout is not None:
-            if base_image_cls is None:
-                raise RuntimeError('Layout modifications require image helpers')
-            base_image = base_image_cls(str(output_path))
-            _apply_layout_colour_modification(
-                base_image=base_image,
-                modify_layout=modify_layout,
+
+def render_atlas(
+    card_list: Sequence[CardRecord],
+    *,
+    deck_name: str,
+    deck_dir: pathlib.Path,
+    columns: int,
+    rows: int,
+    dpi: int = DEFAULT_ATLAS_DPI,
+    entry_names: Optional[Sequence[str]] = None,
+    output_root: pathlib.Path,
+    handle_images: bool,
+    process_image_fn,
+    load_art_surface_fn,
+    load_full_frame_surface_fn,
+    jobs: int = 1,
+    render_cache: Optional[RenderCache] = None,
+    png_compression: Optional[int] = None,
+) -> pathlib.Path:
+    """Draw each unique card once into atlas sheets and write a JSON index.
+
+    Cards are drawn straight into the cells of a sheet surface, which is
+    encoded once. The index maps every deck entry, in deck order, to its
+    sheet and cell. Returns the path of the index.
+    """
+    unique_cards: List[CardRecord] = []
+    cells: Dict[tuple, int] = {}
+    for card in card_list:
+        if card.render_key() not in cells:
+            cells[card.render_key()] = len(unique_cards)
+            unique_cards.append(card)
+
+    per_sheet = columns * rows
+    tasks = [
+        (sheet_number, unique_cards[start:start + per_sheet])
+        for sheet_number, start in enumerate(range(0, len(unique_cards), per_sheet))
+    ]
+    sheet_paths = [atlas_sheet_path(deck_dir, deck_name, sheet_number) for sheet_number, _ in tasks]
+    digests = {}
+
+    if render_cache is not None:
+        pending = []
+        for (sheet_number, cards), output_path in zip(tasks, sheet_paths):
+            digests[output_path] = atlas_digest(
+                [
+                    card_digest(card, dpi, handle_images=handle_images, fingerprint=render_cache.fingerprint)
+                    for card in cards
+                ],
+                columns=columns,
+                rows=rows,
+                png_compression=png_compression,
             )
-            base_image.save(str(output_path))
+            if not render_cache.outputs.is_current(output_path, digests[output_path]):
+                pending.append((sheet_number, cards))
+
+        if len(pending) < len(tasks):
+            print(f'{len(tasks) - len(pending)} atlas sheets are up to date')
+        tasks = pending
+
+    worker = functools.partial(
+        _render_atlas_sheet,
+        columns=columns,
+        rows=rows,
+        dpi=dpi,
+        deck_name=deck_name,
+        deck_dir=deck_dir,
+        output_root=output_root,
+        handle_images=handle_images,
+        process_image_fn=process_image_fn,
+        load_art_surface_fn=load_art_surface_fn,
+        load_full_frame_surface_fn=load_full_frame_surface_fn,
+        png_compression=png_compression,
+    )
+
+    with (PngWriter(png_compression) if jobs <= 1 else contextlib.nullcontext()) as png_writer:
+        if png_writer is not None:
+            worker = functools.partial(worker, png_writer=png_writer)
+
+        for (sheet_number, cards), output_path in zip(tasks, run_jobs(worker, tasks, jobs)):
+            print(f'Atlas sheet {sheet_number}: {len(cards)} cards')
+            if render_cache is not None:
+                render_cache.outputs.record(output_path, digests[output_path])
+
+    if render_cache is not None:
+        render_cache.outputs.save()
+
+    cell_px = layout.pair_mm_to_pixels((layout.CARD_WIDTH_MM, layout.CARD_HEIGHT_MM), dpi)
+    entries = []
+    for index, card in enumerate(card_list):
+        sheet_number, cell = divmod(cells[card.render_key()], per_sheet)
+        entries.append({
+            'index': index,
+            'name': entry_names[index] if entry_names is not None else None,
+            'header': card.headerText,
+            'sheet': sheet_number,
+            'column': cell % columns,
+            'row': cell // columns,
+        })
+
+    index_path = deck_dir / f'{deck_name}_atlas.json'
+    with index_path.open('w', encoding='utf-8') as index_file:
+        json.dump(
+            {
+                'columns': columns,
+                'rows': rows,
+                'dpi': dpi,
+                'cell_size': list(cell_px),
+                'sheets': [path.name for path in sheet_paths],
+                'entries': entries,
+            },
+            index_file,
+            indent=1,
+            ensure_ascii=False,
+        )
+
+    return index_path
+
+
+PDF_POINTS_PER_INCH = 72
+PDF_PAGE_SIZE_PT = (8.5 * PDF_POINTS_PER_INCH, 11 * PDF_POINTS_PER_INCH)
+
+
+def deck_pdf_path(deck_dir: pathlib.Path, deck_name: str) -> pathlib.Path:
+    return deck_dir / f'{deck_name}.pdf'
+
+
+def _shared_image(surface: cairo.ImageSurface, unique_id: str) -> cairo.ImageSurface:
+    # Every paint of a surface tagged with the same id is written to the PDF
+    # as a reference to a single embedded image.
+    if surface.get_mime_data(cairo.MIME_TYPE_UNIQUE_ID) is None:
+        surface.set_mime_data(cairo.MIME_TYPE_UNIQUE_ID, unique_id.encode('utf-8'))
+    return surface
+
 
-        if handle_images:
-            needs_partial_images = any(
-                card.image is not None and not card.imageFullFrame for card in page
+def _paint_image_mm(ctx: cairo.Context, surface: cairo.ImageSurface, origin_mm, dpi: float) -> None:
+    ctx.save()
+    ctx.translate(*origin_mm)
+    ctx.scale(layout.MM_PER_INCH / dpi, layout.MM_PER_INCH / dpi)
+    ctx.set_source_surface(surface, 0, 0)
+    ctx.paint()
+    ctx.restore()
+
+
+def draw_vector_card(
+    ctx: cairo.Context,
+    card: CardRecord,
+    card_matrix: cairo.Matrix,
+    *,
+    deck_name: str,
+    output_root: pathlib.Path,
+    handle_images: bool,
+    process_image_fn,
+    load_art_surface_fn,
+    load_full_frame_surface_fn,
+    art_surfaces: Dict[Tuple[str, bool], Optional[cairo.ImageSurface]],
+) -> None:
+    """Draw a card with ``drawCard`` directly on ``ctx`` using millimetre coordinates.
+
+    Artwork is still raster; ``art_surfaces`` keeps one surface per image so
+    vector backends embed each picture once however many copies are drawn.
+    """
+    art_dpi = layout.SINGLE_CARD_DPI
+
+    ctx.save()
+    ctx.set_matrix(card_matrix)
+    layout.clip_card(ctx)
+    if card.imageFullFrame:
+        ctx.set_source_rgb(1, 1, 1)
+        ctx.paint()
+
+    if handle_images and card.imageFullFrame and card.image is not None:
+        _require_image_helpers(load_full_frame_surface_fn)
+        key = (str(card.image), True)
+        if key not in art_surfaces:
+            art_surfaces[key] = load_full_frame_surface_fn(card, art_dpi, output_root=output_root)
+        if art_surfaces[key] is not None:
+            _paint_image_mm(ctx, _shared_image(art_surfaces[key], f'full-frame:{key[0]}'), (0, 0), art_dpi)
+    ctx.restore()
+
+    ctx.save()
+    ctx.set_matrix(card_matrix)
+    drawCard(card, ctx)
+    ctx.restore()
+
+    if handle_images and card.image is not None and not card.imageFullFrame:
+        _require_image_helpers(process_image_fn, load_art_surface_fn)
+        key = (str(card.image), False)
+        if key not in art_surfaces:
+            image_path = process_image_fn(card, deck_name, dpi=art_dpi, output_root=output_root)
+            art_surfaces[key] = None if image_path is None else load_art_surface_fn(
+                card, deck_name, dpi=art_dpi, output_root=output_root, image_path=image_path
             )
+        if art_surfaces[key] is not None:
+            ctx.save()
+            ctx.set_matrix(card_matrix)
+            _paint_image_mm(ctx, _shared_image(art_surfaces[key], f'art:{key[0]}'), layout.ART_OFFSET_MM, art_dpi)
+            ctx.restore()
+
+
+def render_pdf(
+    card_list: Sequence[CardRecord],
+    *,
+    output_path: pathlib.Path,
+    deck_name: str,
+    output_root: pathlib.Path,
+    handle_images: bool,
+    single_card_mode: bool,
+    modify_layout: Optional[Sequence[int]],
+    process_image_fn,
+    load_art_surface_fn,
+    load_full_frame_surface_fn,
+    layout_path: Optional[str] = None,
+) -> pathlib.Path:
+    """Write the cards to one multi-page vector PDF.
+
+    Deck pages share the layout template, which is embedded once and painted
+    under every page; with ``single_card_mode`` each card gets its own
+    63x85mm page instead.
+    """
+    if single_card_mode:
+        page_size = tuple(
+            value / layout.MM_PER_INCH * PDF_POINTS_PER_INCH
+            for value in (layout.CARD_WIDTH_MM, layout.CARD_HEIGHT_MM)
+        )
+        pages = [[card] for card in card_list]
+        template = None
+    else:
+        page_size = PDF_PAGE_SIZE_PT
+        pages = list(chunk_cards(card_list))
+        template = _shared_image(
+            layout.get_template(modify_layout, layout_path),
+            f'layout:{layout_path or layout.DEFAULT_LAYOUT_PATH}:{modify_layout}',
+        )
 
-            if needs_partial_images:
-                _require_image_helpers(
-                    base_image_cls,
-                    add_image_fn,
-                    process_image_fn,
+    surface = cairo.PDFSurface(str(output_path), *page_size)
+    ctx = cairo.Context(surface)
+    art_surfaces: Dict[Tuple[str, bool], Optional[cairo.ImageSurface]] = {}
+
+    for page_number, page in enumerate(pages):
+        print(f'Page {page_number}:')
+        if template is not None:
+            ctx.save()
+            ctx.scale(page_size[0] / template.get_width(), page_size[1] / template.get_height())
+            ctx.set_source_surface(template, 0, 0)
+            ctx.paint()
+            ctx.restore()
+
+        for index, card in enumerate(page):
+            if single_card_mode:
+                card_matrix = layout.get_single_card_matrix(PDF_POINTS_PER_INCH)
+            else:
+                card_pos = (index % 3, index // 3)
+                print(card_pos)
+                card_matrix = layout.get_card_matrix(card_pos, PDF_POINTS_PER_INCH)
+            print(card)
+            with profiling.span('card', 'card', card=str(card)):
+                draw_vector_card(
+                    ctx,
+                    card,
+                    card_matrix,
+                    deck_name=deck_name,
+                    output_root=output_root,
+                    handle_images=handle_images,
+                    process_image_fn=process_image_fn,
+                    load_art_surface_fn=load_art_surface_fn,
+                    load_full_frame_surface_fn=load_full_frame_surface_fn,
+                    art_surfaces=art_surfaces,
                 )
-                base_image = base_image_cls(str(output_path))
-                for index, card in enumerate(page):
-                    if card.image is None or card.imageFullFrame:
-                        continue
-
-                    card_pos = (index % 3, index // 3)
-                    card_origin_mm = layout.get_card_origin_mm(card_pos)
-                    image_position_mm = (
-                        card_origin_mm[0] + layout.ART_OFFSET_MM[0],
-                        card_origin_mm[1] + layout.ART_OFFSET_MM[1],
-                    )
-                    process_image_fn(
-                        card,
-                        deck_name,
-                        dpi=page_dpi,
-                        output_root=output_root,
-                    )
-                    base_image.update(
-                        add_image_fn(
-                            card,
-                            base_image,
-                            deck_name,
-                            position_mm=image_position_mm,
-                            dpi=page_dpi,
-                            output_root=output_root,
-                        )
-                    )
 
-                base_image.save(str(output_path))
+        ctx.show_page()
+
+    with profiling.span('encode', 'output', path=str(output_path)):
+        surface.finish()
+    return output_path
 
 
 def write_deck_copy(
@@ -309,78 +1160,229 @@ def write_deck_copy(
             writer.writerow(row)
 
 
-def main() -> None:
-    args = parse_arguments()
+def open_cards(args: argparse.Namespace, render_cache: Optional[RenderCache]) -> CardDeck:
+    """Load the card database named by the command line arguments."""
+    if render_cache is not None:
+        return CardDeck(args.cards, store_dir=render_cache.directory)
+
+    # Deck runs only materialise the cards the decks refer to.
+    card_names = None
+    if not args.single_card:
+        card_names = set().union(*(deck_card_names(deck_file) for deck_file in args.deck))
+    return CardDeck(args.cards, names=card_names)
+
 
+def render(
+    args: argparse.Namespace,
+    output_root: pathlib.Path,
+    render_cache: Optional[RenderCache],
+    cards: Optional[CardDeck] = None,
+) -> None:
+    """Render the cards or decks described by the command line arguments once.
+
+    Every deck is rendered in the same process against one card database,
+    so the layout, fonts, resized art and card tiles are shared between them.
+    ``cards`` reuses an open card database; otherwise one is opened and
+    closed again once the decks are built.
+    """
     handle_images = args.images
     modify_layout = args.rgb
     cards_file = args.cards
     single_card_mode = args.single_card
-    deck_file = args.deck
-    output_root = pathlib.Path(args.output_dir)
-    output_root.mkdir(parents=True, exist_ok=True)
-
-    cards = CardDeck(cards_file)
-    deck_name, card_list, deck_rows = build_card_list(
-        cards=cards,
-        cards_file=cards_file,
-        deck_file=deck_file,
-        single_card_mode=single_card_mode,
-    )
+    deck_files = [None] if single_card_mode else args.deck
 
-    deck_dir, cards_output_dir = ensure_output_directories(
-        output_root,
-        deck_name,
-        single_card_mode,
-    )
+    if args.profile:
+        profiling.enable()
 
-    base_image_cls = add_image_fn = process_image_fn = load_full_frame_surface_fn = None
+    with profiling.span('loadCards', 'cards'):
+        owns_cards = cards is None
+        if owns_cards:
+            cards = open_cards(args, render_cache)
 
-    if handle_images or (modify_layout is not None):
-        from add_images import BaseImage
+        try:
+            built_decks = []
+            for deck_file in deck_files:
+                deck_name, card_list, deck_rows = build_card_list(
+                    cards=cards,
+                    cards_file=cards_file,
+                    deck_file=deck_file,
+                    single_card_mode=single_card_mode,
+                )
+                deck_dir, cards_output_dir = ensure_output_directories(
+                    output_root,
+                    deck_name,
+                    single_card_mode,
+                )
+                built_decks.append((DeckJob(deck_name, deck_dir, card_list), cards_output_dir, deck_rows))
+            card_names = list(cards.getDb().keys()) if single_card_mode else None
+        finally:
+            if owns_cards:
+                cards.close()
 
-        base_image_cls = BaseImage
+    process_image_fn = load_art_surface_fn = load_full_frame_surface_fn = None
 
     if handle_images:
-        from add_images import addImage, load_full_frame_surface, processImage
+        from add_images import load_art_surface, load_full_frame_surface, processImage
 
-        add_image_fn = addImage
         process_image_fn = processImage
+        load_art_surface_fn = load_art_surface
         load_full_frame_surface_fn = load_full_frame_surface
 
-    if single_card_mode and cards_output_dir is not None:
+    render_options = dict(
+        output_root=output_root,
+        handle_images=handle_images,
+        process_image_fn=process_image_fn,
+        load_art_surface_fn=load_art_surface_fn,
+        load_full_frame_surface_fn=load_full_frame_surface_fn,
+    )
+
+    if args.atlas is not None:
+        columns, rows = args.atlas
+        for deck, _, deck_rows in built_decks:
+            if deck_rows is None:
+                entry_names = card_names
+            else:
+                entry_names = [row[1] for row in deck_rows[1:] for _ in range(int(row[0]))]
+            index_path = render_atlas(
+                deck.cards,
+                deck_name=deck.name,
+                deck_dir=deck.directory,
+                columns=columns,
+                rows=rows,
+                dpi=args.dpi or DEFAULT_ATLAS_DPI,
+                entry_names=entry_names,
+                jobs=args.jobs,
+                render_cache=render_cache,
+                png_compression=args.png_compression,
+                **render_options,
+            )
+            print(f'Wrote {index_path}')
+    elif args.format == 'pdf':
+        for deck, _, _ in built_decks:
+            output_path = render_pdf(
+                deck.cards,
+                output_path=deck_pdf_path(deck.directory, deck.name),
+                deck_name=deck.name,
+                single_card_mode=single_card_mode,
+                modify_layout=modify_layout,
+                layout_path=args.layout,
+                **render_options,
+            )
+            print(f'Wrote {output_path}')
+    elif single_card_mode:
+        deck, cards_output_dir, _ = built_decks[0]
         render_single_cards(
-            card_list,
-            deck_name=deck_name,
+            deck.cards,
+            deck_name=deck.name,
             cards_output_dir=cards_output_dir,
-            output_root=output_root,
-            handle_images=handle_images,
-            base_image_cls=base_image_cls,
-            add_image_fn=add_image_fn,
-            process_image_fn=process_image_fn,
-            load_full_frame_surface_fn=load_full_frame_surface_fn,
+            dpi=args.dpi or layout.SINGLE_CARD_DPI,
+            jobs=args.jobs,
+            render_cache=render_cache,
+            png_compression=args.png_compression,
+            **render_options,
         )
     else:
-        render_deck_pages(
-            card_list,
-            deck_name=deck_name,
-            deck_dir=deck_dir,
-            output_root=output_root,
-            handle_images=handle_images,
+        render_decks(
+            [deck for deck, _, _ in built_decks],
             modify_layout=modify_layout,
-            base_image_cls=base_image_cls,
-            add_image_fn=add_image_fn,
-            process_image_fn=process_image_fn,
-            load_full_frame_surface_fn=load_full_frame_surface_fn,
+            layout_path=args.layout,
+            dpi=args.dpi,
+            jobs=args.jobs,
+            render_cache=render_cache,
+            png_compression=args.png_compression,
+            **render_options,
         )
 
-    if (not single_card_mode) and deck_rows is not None:
-        write_deck_copy(
-            deck_rows,
-            deck_name=deck_name,
-            deck_dir=deck_dir,
-        )
+    for deck, _, deck_rows in built_decks:
+        if (not single_card_mode) and deck_rows is not None:
+            write_deck_copy(
+                deck_rows,
+                deck_name=deck.name,
+                deck_dir=deck.directory,
+            )
+
+    if args.profile:
+        events = profiling.take_events()
+        profiling.write_trace(args.profile, events)
+        print(profiling.summary(events))
+        print(f'Trace saved to {args.profile}')
+
+
+def watched_paths(args: argparse.Namespace) -> List[pathlib.Path]:
+    """Return the inputs a render run depends on."""
+    paths = [pathlib.Path(args.cards), pathlib.Path(args.layout or layout.DEFAULT_LAYOUT_PATH)]
+    if args.deck is not None:
+        paths.extend(pathlib.Path(deck_file) for deck_file in args.deck)
+    if args.images and SOURCE_IMAGES_DIR.is_dir():
+        paths.append(SOURCE_IMAGES_DIR)
+    return paths
+
+
+def watch_and_render(args: argparse.Namespace, output_root: pathlib.Path, render_cache: RenderCache) -> None:
+    """Re-render after every change to the inputs until interrupted.
+
+    The process stays alive so decoded layouts, card tiles and fonts are
+    reused; the render cache then skips every card and page that did not
+    change. The card store stays open and is only reopened when the cards
+    file changes. Run it inside ``shared_worker_pool`` to keep the workers too.
+    """
+    cards_path = pathlib.Path(args.cards).resolve()
+    cards: Optional[CardDeck] = None
+
+    def on_change(changed: List[str]) -> None:
+        nonlocal cards
+        print(f"Changed: {', '.join(changed)}")
+        started = time.perf_counter()
+        try:
+            if cards is not None and cards_path in {pathlib.Path(path).resolve() for path in changed}:
+                cards.close()
+                cards = None
+            if cards is None:
+                cards = open_cards(args, render_cache)
+            render(args, output_root, render_cache, cards)
+        except Exception as error:  # keep watching, the next save may fix it
+            print(f'Render failed: {error}')
+            return
+        print(f'Updated in {time.perf_counter() - started:.2f}s')
+
+    print('Watching for changes, press Ctrl+C to stop')
+    try:
+        file_watch.watch(lambda: watched_paths(args), on_change)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if cards is not None:
+            cards.close()
+
+
+def main() -> None:
+    if sys.argv[1:2] == ['browse']:
+        import browse_model
+
+        browse_model.main(sys.argv[2:])
+        return
+
+    if sys.argv[1:2] == ['serve']:
+        import render_server
+
+        render_server.main(sys.argv[2:])
+        return
+
+    args = parse_arguments()
+
+    output_root = pathlib.Path(args.output_dir)
+    output_root.mkdir(parents=True, exist_ok=True)
+
+    render_cache = None if args.no_cache else RenderCache(output_root)
+    fonts.get_registry()
+
+    with shared_worker_pool(args.jobs):
+        render(args, output_root, render_cache)
+
+        if args.watch:
+            watch_and_render(args, output_root, render_cache)
 
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()
     main()
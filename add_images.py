@@ -1,12 +1,15 @@
-import io
+import hashlib
+import os
 import pathlib
-from functools import lru_cache
-from typing import Union
+from typing import Dict, Optional, Tuple, Union
 
 import cairo
+import numpy as np
 
 import card_model
 import layout
+from surface_cache import SurfaceCache
+from utils import SOURCE_IMAGES_DIR, atomic_write, file_digest
 
 from PIL import Image
 
@@ -15,51 +18,91 @@ try:
 except AttributeError:
     _RESAMPLE = Image.LANCZOS
 
-def _ensure_output_dir(deck: str, root: Union[pathlib.Path, str] = 'decks') -> pathlib.Path:
-    """Return the directory used to store processed images for a deck.
+_RESAMPLE_NAME = getattr(_RESAMPLE, 'name', str(_RESAMPLE))
 
-    Parameters
-    ----------
-    deck:
-        Name of the deck currently being processed.
-    root:
-        Base output directory where decks are stored. Defaults to ``decks``
-        to remain backwards compatible with previous behaviour.
-    """
+# Resized art shared by every deck, relative to the output root.
+ART_CACHE_DIR = pathlib.Path('.cache') / 'art'
 
-    base_path = pathlib.Path(root)
-    path = base_path / deck / 'images'
-    path.mkdir(parents=True, exist_ok=True)
-    return path
-
-class BaseImage:
-    def __init__(self, image):
-        self.baseImage = None
-
-        if (image is not None):
-            self.baseImage = self.load(image)
-    
-    def load(self, image):
-        return Image.open(image)
-    def copy(self):
-        return self.baseImage.copy()
-    def update(self, image: Image):
-        self.baseImage = image
-    def get(self):
-        return self.baseImage
-    def save(self,path):
-        self.baseImage.save(path)
+def _has_alpha(image) -> bool:
+    return 'A' in image.getbands() or 'transparency' in image.info
 
 
 def _load_resized_source_image(image_name: str, size_px):
-    source_path = pathlib.Path('images') / image_name
+    """Resize a source image, keeping an alpha channel only when it has one."""
+    source_path = SOURCE_IMAGES_DIR / image_name
     try:
         with Image.open(source_path) as original_image:
-            resized_image = original_image.resize(size_px, _RESAMPLE)
+            mode = 'RGBA' if _has_alpha(original_image) else 'RGB'
+            if original_image.mode != mode:
+                original_image = original_image.convert(mode)
+            return original_image.resize(size_px, _RESAMPLE)
     except (FileNotFoundError, OSError):
         return None
 
-    return resized_image.convert('RGBA')
+
+def _art_key(image_name: str, size_px: Tuple[int, int]) -> Optional[str]:
+    """Identify a resize of ``image_name`` by source content, size and filter."""
+    source_digest = file_digest(SOURCE_IMAGES_DIR / image_name)
+    if source_digest is None:
+        return None
+
+    return f'{source_digest}:{size_px[0]}x{size_px[1]}:{_RESAMPLE_NAME}'
+
+
+class ArtStore:
+    """Directory of resized artwork shared by every deck under an output root.
+
+    Files are named after the source content, the target size and the
+    resample filter, and are always lossless PNG whatever the source format. The names on disk are listed once, so a hit is a set
+    lookup instead of opening the image to check its size.
+    """
+
+    def __init__(self, directory: Union[pathlib.Path, str]):
+        self.directory = pathlib.Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._index = {entry.name for entry in os.scandir(self.directory) if entry.is_file()}
+
+    def name_for(self, image_name: str, size_px: Tuple[int, int]) -> Optional[str]:
+        key = _art_key(image_name, size_px)
+        if key is None:
+            return None
+
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return f'{digest}.png'
+
+    def get(self, image_name: str, size_px: Tuple[int, int]) -> Optional[pathlib.Path]:
+        """Return the resized copy of ``image_name``, creating it on first use."""
+        name = self.name_for(image_name, size_px)
+        if name is None:
+            return None
+
+        destination = self.directory / name
+        # Another worker process may have stored it since the index was read.
+        if name in self._index or destination.exists():
+            self._index.add(name)
+            return destination
+
+        resized_image = _load_resized_source_image(image_name, size_px)
+        if resized_image is None:
+            return None
+
+        with atomic_write(destination) as temporary:
+            resized_image.save(temporary, format='PNG')
+
+        self._index.add(name)
+        return destination
+
+
+_ART_STORES: Dict[str, ArtStore] = {}
+
+
+def get_art_store(output_root: Union[pathlib.Path, str] = 'decks') -> ArtStore:
+    """Return the art store of ``output_root``, shared by every deck and render mode."""
+    directory = pathlib.Path(output_root).resolve() / ART_CACHE_DIR
+    store = _ART_STORES.get(str(directory))
+    if store is None:
+        store = _ART_STORES[str(directory)] = ArtStore(directory)
+    return store
 
 
 def processImage(
@@ -69,86 +112,102 @@ def processImage(
     size_mm=layout.ART_SIZE_MM,
     dpi: int = layout.SINGLE_CARD_DPI,
     output_root: Union[pathlib.Path, str] = 'decks',
-):
+) -> Optional[pathlib.Path]:
+    """Make sure the art of ``card`` is resized in the shared art store.
+
+    ``deck`` is kept for compatibility; the resized file is shared by every
+    deck under ``output_root``.
+    """
     if card.image is None:
-        return
+        return None
 
     size_px = layout.pair_mm_to_pixels(size_mm, dpi)
-    output_dir = _ensure_output_dir(deck, output_root)
-    destination = output_dir / str(card.image)
+    return get_art_store(output_root).get(str(card.image), size_px)
+
 
-    if destination.exists():
-        try:
-            with Image.open(destination) as existing_image:
-                if existing_image.size == size_px:
-                    return
-        except (FileNotFoundError, OSError):
-            pass
+def _image_to_surface(image) -> cairo.ImageSurface:
+    """Copy a PIL image straight into a new cairo surface buffer.
 
-    resized_image = _load_resized_source_image(str(card.image), size_px)
-    if resized_image is None:
-        return
+    Opaque images become ``FORMAT_RGB24`` surfaces and skip alpha handling;
+    images with transparency are premultiplied into ``FORMAT_ARGB32``.
+    """
+    if _has_alpha(image):
+        rgba = np.asarray(image.convert('RGBA'), dtype=np.uint16)
+        alpha = rgba[..., 3:]
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, *image.size)
+        pixels = layout.surface_pixels(surface)
+        pixels[..., :3] = ((rgba[..., 2::-1] * alpha + 127) // 255).astype(np.uint8)
+        pixels[..., 3] = alpha[..., 0]
+    else:
+        rgb = np.asarray(image.convert('RGB'))
+        surface = cairo.ImageSurface(cairo.FORMAT_RGB24, *image.size)
+        pixels = layout.surface_pixels(surface)
+        pixels[..., :3] = rgb[..., ::-1]
+        pixels[..., 3] = 255
+
+    surface.mark_dirty()
+    return surface
 
-    resized_image.save(destination)
-    
 
+def _load_surface(image_path: pathlib.Path) -> Optional[cairo.ImageSurface]:
+    try:
+        with Image.open(image_path) as image:
+            return _image_to_surface(image)
+    except (FileNotFoundError, OSError):
+        return None
 
-def addImage(
+
+def load_art_surface(
     card: card_model.CardModel,
-    base: BaseImage,
     deck: str,
     *,
-    position_mm=None,
     size_mm=layout.ART_SIZE_MM,
     dpi: int = layout.SINGLE_CARD_DPI,
     output_root: Union[pathlib.Path, str] = 'decks',
+    image_path: Optional[pathlib.Path] = None,
 ):
+    """Load the processed art of a card as a cairo surface sized for the art frame.
 
-    if card.image is None:
-        return base.get()
-
-    output_dir = _ensure_output_dir(deck, output_root)
-    image_path = output_dir / str(card.image)
-
-    try:
-        card_image = Image.open(image_path)
-    except (FileNotFoundError, OSError):
-        return base.get()
-
-    target_size_px = layout.pair_mm_to_pixels(size_mm, dpi)
-    if card_image.size != target_size_px:
-        card_image = card_image.resize(target_size_px, _RESAMPLE)
+    Pass the ``image_path`` returned by :func:`processImage` to skip a second
+    store lookup.
+    """
+    if image_path is None:
+        image_path = processImage(card, deck, size_mm=size_mm, dpi=dpi, output_root=output_root)
+    if image_path is None:
+        return None
 
-    if card_image.mode != 'RGBA':
-        card_image = card_image.convert('RGBA')
+    return _load_surface(image_path)
 
-    image_copy = base.copy()
-    position_mm = position_mm or layout.ART_OFFSET_MM
-    position_px = layout.pair_mm_to_pixels(position_mm, dpi)
 
-    if 'A' in card_image.getbands():
-        mask = card_image.split()[-1]
-    else:
-        mask = None
-    image_copy.paste(card_image, position_px, mask)
-    return image_copy
+# A 300 DPI full-frame surface is about 3 MB, so the budget is in bytes.
+_FULL_FRAME_SURFACES = SurfaceCache(max_bytes=256 * 1024 * 1024)
 
 
-@lru_cache(maxsize=128)
 def _load_full_frame_surface_cached(image_name: str, dpi: int):
     size_px = layout.pair_mm_to_pixels((layout.CARD_WIDTH_MM, layout.CARD_HEIGHT_MM), dpi)
-    resized_image = _load_resized_source_image(image_name, size_px)
-    if resized_image is None:
+    key = _art_key(image_name, size_px)
+    if key is None:
         return None
 
-    buffer = io.BytesIO()
-    resized_image.save(buffer, format='PNG')
-    buffer.seek(0)
-    surface = cairo.ImageSurface.create_from_png(buffer)
-    return surface
+    def render() -> Optional[cairo.ImageSurface]:
+        resized_image = _load_resized_source_image(image_name, size_px)
+        return None if resized_image is None else _image_to_surface(resized_image)
+
+    # Keys are content addresses, so an edited source gets a new entry.
+    return _FULL_FRAME_SURFACES.get_or_render(key, render)
 
 
-def load_full_frame_surface(card: card_model.CardModel, dpi: int):
+def load_full_frame_surface(
+    card: card_model.CardModel,
+    dpi: int,
+    *,
+    output_root: Union[pathlib.Path, str] = 'decks',
+):
+    """Load the full-frame art of a card, resized straight into a cached surface.
+
+    ``output_root`` is kept for compatibility; full-frame art is not written
+    to the art store.
+    """
     if (card.image is None) or (not getattr(card, "imageFullFrame", False)):
         return None
 
@@ -0,0 +1,251 @@
+#! /usr/bin/env python3
+"""Throughput benchmarks for the render pipeline.
+
+Every scenario writes a synthetic cards JSON, deck CSV and artwork into a
+scratch directory, then times ``build_card_list`` followed by
+``render_deck_pages`` or ``render_single_cards`` with cold caches. Results
+are saved as JSON so two runs can be compared with ``--compare``.
+"""
+import argparse
+import contextlib
+import csv
+import io
+import itertools
+import json
+import os
+import pathlib
+import platform
+import sys
+import tempfile
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import cairo  # noqa: E402
+from PIL import Image  # noqa: E402
+
+import LWCProto  # noqa: E402
+import add_images  # noqa: E402
+import draw_card  # noqa: E402
+import layout  # noqa: E402
+from card_model import CardDeck  # noqa: E402
+
+SHORT_TEXT = 'Roba una carta.'
+LONG_TEXT = ' '.join(
+    ['Al comienzo de tu turno elige una unidad enemiga y reduce su resistencia en 2 hasta el final de la ronda.'] * 4
+)
+RECOLOUR_RGB = (180, 40, 40)
+
+
+class Scenario(NamedTuple):
+    cards: int
+    text: str  # 'short' or 'long'
+    art: str  # 'none', 'partial' or 'full'
+    rgb: bool
+
+    @property
+    def name(self) -> str:
+        name = f'{self.cards}-{self.text}-{self.art}'
+        return f'{name}-rgb' if self.rgb else name
+
+
+def default_scenarios(sizes: Iterable[int]) -> List[Scenario]:
+    variants = [
+        ('short', 'none', False),
+        ('long', 'none', False),
+        ('short', 'partial', False),
+        ('short', 'full', False),
+        ('short', 'none', True),
+    ]
+    return [Scenario(size, *variant) for size, variant in itertools.product(sizes, variants)]
+
+
+def write_inputs(scenario: Scenario, directory: pathlib.Path) -> Dict[str, pathlib.Path]:
+    """Write the cards JSON, deck CSV and source images of a scenario."""
+    images_dir = directory / 'images'
+    images_dir.mkdir(parents=True, exist_ok=True)
+
+    image_names = []
+    if scenario.art != 'none':
+        for index in range(8):
+            name = f'art{index}.jpg'
+            Image.effect_mandelbrot((800, 600), (-2 + index * 0.1, -1.2, 1, 1.2), 64).convert('RGB').save(images_dir / name)
+            image_names.append(name)
+
+    text = SHORT_TEXT if scenario.text == 'short' else LONG_TEXT
+    cards = {}
+    for index in range(scenario.cards):
+        entry = {
+            'header': {'text': f'Carta {index}', 'color': '#000000'},
+            'type': 'Unidad',
+            'subtype': f'Tipo {index % 5}',
+            'card_text': {'text': f'{text} ({index})', 'colour': '#000000'},
+            'footer': {'text': f'Serie {index % 3}', 'color': '#333333'},
+            'commandPoints': f'{index % 9}/{index % 4}',
+            'power': index % 10,
+            'toughness': index % 7,
+        }
+        if image_names:
+            entry['image'] = image_names[index % len(image_names)]
+            entry['full_frame_image'] = scenario.art == 'full'
+        cards[f'Carta{index}'] = entry
+
+    cards_path = directory / 'cards.json'
+    with cards_path.open('w', encoding='utf-8') as cards_file:
+        json.dump(cards, cards_file)
+
+    deck_path = directory / 'deck.csv'
+    with deck_path.open('w', encoding='utf-8', newline='') as deck_file:
+        writer = csv.writer(deck_file)
+        writer.writerow(['Qty', 'Name'])
+        for name in cards:
+            writer.writerow([1, name])
+
+    return {'cards': cards_path, 'deck': deck_path}
+
+
+def reset_caches() -> None:
+    """Drop every in-process cache so each scenario starts cold."""
+    LWCProto._CARD_TILES.clear()
+    layout._load_template.cache_clear()
+    add_images._FULL_FRAME_SURFACES.clear()
+    add_images._ART_STORES.clear()
+    draw_card._WORD_METRICS.clear()
+    draw_card._WRAPPED_TEXT.clear()
+
+
+def run_scenario(scenario: Scenario, mode: str, *, jobs: int, png_compression: Optional[int]) -> dict:
+    reset_caches()
+    previous_cwd = os.getcwd()
+
+    with tempfile.TemporaryDirectory(prefix='lwc-bench-') as scratch:
+        scratch_dir = pathlib.Path(scratch)
+        inputs = write_inputs(scenario, scratch_dir)
+        output_root = scratch_dir / 'out'
+        single_card_mode = mode == 'single'
+        handle_images = scenario.art != 'none'
+
+        # Source art is looked up relative to the working directory.
+        os.chdir(scratch_dir)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                started = time.perf_counter()
+                deck_name, card_list, _ = LWCProto.build_card_list(
+                    cards=CardDeck(str(inputs['cards'])),
+                    cards_file=str(inputs['cards']),
+                    deck_file=None if single_card_mode else str(inputs['deck']),
+                    single_card_mode=single_card_mode,
+                )
+                built = time.perf_counter()
+
+                deck_dir, cards_output_dir = LWCProto.ensure_output_directories(
+                    output_root, deck_name, single_card_mode,
+                )
+                render_options = dict(
+                    deck_name=deck_name,
+                    output_root=output_root,
+                    handle_images=handle_images,
+                    process_image_fn=add_images.processImage,
+                    load_art_surface_fn=add_images.load_art_surface,
+                    load_full_frame_surface_fn=add_images.load_full_frame_surface,
+                    jobs=jobs,
+                    png_compression=png_compression,
+                )
+                if single_card_mode:
+                    LWCProto.render_single_cards(card_list, cards_output_dir=cards_output_dir, **render_options)
+                else:
+                    LWCProto.render_deck_pages(
+                        card_list,
+                        deck_dir=deck_dir,
+                        modify_layout=RECOLOUR_RGB if scenario.rgb else None,
+                        **render_options,
+                    )
+                finished = time.perf_counter()
+        finally:
+            os.chdir(previous_cwd)
+
+    card_count = len(card_list)
+    page_count = card_count if single_card_mode else len(list(LWCProto.chunk_cards(card_list)))
+    total = finished - started
+    return {
+        'scenario': scenario.name,
+        'mode': mode,
+        'cards': card_count,
+        'pages': page_count,
+        'build_seconds': round(built - started, 6),
+        'render_seconds': round(finished - built, 6),
+        'seconds': round(total, 6),
+        'cards_per_sec': round(card_count / total, 3) if total else None,
+        'pages_per_sec': round(page_count / total, 3) if total else None,
+    }
+
+
+def compare(previous: dict, current: dict) -> List[str]:
+    """Return one line per result present in both runs with the relative change."""
+    baseline = {(result['scenario'], result['mode']): result for result in previous['results']}
+    lines = [f"{'scenario':<24} {'mode':<7} {'before':>10} {'after':>10} {'change':>8}"]
+    for result in current['results']:
+        old = baseline.get((result['scenario'], result['mode']))
+        if old is None or not old['cards_per_sec'] or not result['cards_per_sec']:
+            continue
+        change = (result['cards_per_sec'] / old['cards_per_sec'] - 1) * 100
+        lines.append(
+            f"{result['scenario']:<24} {result['mode']:<7} "
+            f"{old['cards_per_sec']:>10.1f} {result['cards_per_sec']:>10.1f} {change:>+7.1f}%"
+        )
+    return lines
+
+
+def parse_arguments(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Measure LWCProto render throughput on synthetic decks')
+    parser.add_argument('--sizes', help='Deck sizes to generate', type=int, nargs='+', default=[10, 100, 1000], metavar='N')
+    parser.add_argument('--modes', help='Render modes to measure', nargs='+', choices=('deck', 'single'), default=['deck', 'single'])
+    parser.add_argument('--only', help='Run only scenarios whose name contains this text', metavar='TEXT')
+    parser.add_argument('-j', '--jobs', help='Worker processes passed to the renderer', type=LWCProto.job_count, default=1, metavar='N')
+    parser.add_argument('--png-compression', help='zlib level passed to the renderer', type=LWCProto.png_compression_level, metavar='LEVEL')
+    parser.add_argument('-o', '--output', help='JSON file where results are saved', default='bench_results.json', metavar='FILE')
+    parser.add_argument('--compare', help='Previous results JSON to compare against', type=LWCProto.extant_file, metavar='FILE')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_arguments(argv)
+
+    scenarios = default_scenarios(args.sizes)
+    if args.only:
+        scenarios = [scenario for scenario in scenarios if args.only in scenario.name]
+
+    results = []
+    for scenario, mode in itertools.product(scenarios, args.modes):
+        result = run_scenario(scenario, mode, jobs=args.jobs, png_compression=args.png_compression)
+        results.append(result)
+        print(
+            f"{result['scenario']:<24} {mode:<7} {result['seconds']:>8.2f}s "
+            f"{result['cards_per_sec']:>8.1f} cards/s {result['pages_per_sec']:>8.1f} pages/s"
+        )
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'cairo': cairo.cairo_version_string() if hasattr(cairo, 'cairo_version_string') else None,
+        'platform': platform.platform(),
+        'jobs': args.jobs,
+        'png_compression': args.png_compression,
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as output_file:
+        json.dump(report, output_file, indent=1)
+    print(f'Results saved to {args.output}')
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as previous_file:
+            previous = json.load(previous_file)
+        print()
+        print('\n'.join(compare(previous, report)))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,41 @@
-import json
+import argparse
 import pathlib
+from typing import Optional, Sequence
 
-cardDb = dict()
-i = 0
-with open(pathlib.Path(__file__).parent / 'AllCards.json', encoding='utf-8') as dbFile:
-    db = json.load(dbFile)
-
-for level1 in db['data'].keys():
-    i = i + 1
-    print (level1)
-    print ('\n')
-    if i > 5:
-        break
+import LWCProto
+from card_store import open_card_store
+
+
+def parse_arguments(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog='LWCProto.py browse',
+        description='Search a cards file by name, type or text',
+    )
+    parser.add_argument('-c', '--cards', help='json file containing cards description', type=LWCProto.extant_file, metavar='FILE', default='AllCards.json')
+    parser.add_argument('-n', '--name', help='Only show cards whose id or header contains TEXT', metavar='TEXT')
+    parser.add_argument('-t', '--type', help='Only show cards whose type contains TEXT', metavar='TEXT')
+    parser.add_argument('-x', '--text', help='Only show cards whose card text contains TEXT', metavar='TEXT')
+    parser.add_argument('--limit', help='Maximum number of cards to list', type=int, default=20)
+    parser.add_argument('-o', '--output-dir', help='Directory holding the render cache where the compiled cards are stored', default='decks')
+
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_arguments(argv)
+
+    store = open_card_store(pathlib.Path(args.cards), pathlib.Path(args.output_dir) / '.cache')
+    try:
+        for name, header, type_str in store.search(
+            name=args.name,
+            type_str=args.type,
+            text=args.text,
+            limit=args.limit,
+        ):
+            print(f'{name}: {header} ({type_str})')
+    finally:
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,25 +1,181 @@
 import json
 import pathlib
+import re
+from typing import Container, Iterator, Optional, Tuple
+
+_WHITESPACE = re.compile(r'\s*')
+_STRUCTURE = re.compile(r'["{}\[\]]')
+_STRING_TAIL = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.S)
+_DELIMITERS = frozenset(' \t\r\n,:]}')
+
+
+class _JsonStream:
+    """Incremental reader over a JSON text file, holding one chunk at a time."""
+
+    def __init__(self, file, chunk_size: int):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> None:
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+
+    def _skip_whitespace(self) -> None:
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) or self.eof:
+                return
+            self._fill()
+
+    def peek(self) -> str:
+        self._skip_whitespace()
+        if self.pos >= len(self.buffer):
+            raise ValueError('Unexpected end of JSON data')
+        return self.buffer[self.pos]
+
+    def expect(self, token: str) -> None:
+        if self.peek() != token:
+            raise ValueError(f'Expected {token!r} at JSON offset {self.pos}')
+        self.pos += 1
+
+    def decode(self):
+        self._skip_whitespace()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                self._fill()
+                continue
+
+            # A number cut by the end of the chunk also decodes, so only
+            # accept values followed by a delimiter or the end of the file.
+            if self.eof or (end < len(self.buffer) and self.buffer[end] in _DELIMITERS):
+                self.pos = end
+                return value
+            self._fill()
+
+    def skip(self) -> None:
+        """Advance past the next value without building Python objects for it."""
+        if self.peek() not in '{[':
+            self.decode()
+            return
+
+        depth = 0
+        while True:
+            match = _STRUCTURE.search(self.buffer, self.pos)
+            if match is None:
+                if self.eof:
+                    raise ValueError('Unterminated JSON value')
+                self.pos = len(self.buffer)
+                self._fill()
+                continue
+
+            token = match.group()
+            if token == '"':
+                tail = _STRING_TAIL.match(self.buffer, match.end())
+                if tail is None:
+                    if self.eof:
+                        raise ValueError('Unterminated JSON string')
+                    # Keep the opening quote and read the rest of the string.
+                    self.pos = match.start()
+                    self._fill()
+                    continue
+                self.pos = tail.end()
+            elif token in '{[':
+                depth += 1
+                self.pos = match.end()
+            else:
+                depth -= 1
+                self.pos = match.end()
+                if depth == 0:
+                    return
+
+
+def iter_card_entries(
+    path,
+    names: Optional[Container[str]] = None,
+    *,
+    chunk_size: int = 1 << 20,
+) -> Iterator[Tuple[str, dict]]:
+    """Stream ``(name, entry)`` pairs from a cards JSON object.
+
+    Only entries whose name is in ``names`` (or every entry when ``names`` is
+    ``None``) are decoded; the rest are skipped without being materialised,
+    so memory use depends on the requested cards rather than the file size.
+    """
+    with open(path, encoding='utf-8') as db_file:
+        stream = _JsonStream(db_file, chunk_size)
+        stream.expect('{')
+        if stream.peek() == '}':
+            return
+
+        while True:
+            name = stream.decode()
+            stream.expect(':')
+            if names is None or name in names:
+                yield name, stream.decode()
+            else:
+                stream.skip()
+
+            if stream.peek() == '}':
+                return
+            stream.expect(',')
 
 
 class CardDeck:
-    def __init__(self, name='AllCards.json'):
+    def __init__(
+        self,
+        name='AllCards.json',
+        names: Optional[Container[str]] = None,
+        store_dir=None,
+    ):
         self.cardDb = dict()
 
-        self.load(name)
+        self.load(name, names, store_dir)
+
+    def load(self, name, names: Optional[Container[str]] = None, store_dir=None):
+        """Load the card database.
 
-    def load(self, name):
+        With ``store_dir`` the JSON is compiled into an indexed store there
+        (only when it changed) and cards are looked up by name on demand.
+        Otherwise only ``names`` are kept when given.
+        """
         db_path = pathlib.Path(name)
 
         if (not db_path.is_absolute()) and (not db_path.exists()):
             db_path = pathlib.Path(__file__).parent / name
 
+        if store_dir is not None:
+            from card_store import open_card_store
+
+            self.cardDb = open_card_store(db_path, store_dir)
+            return
+
+        if names is not None:
+            self.cardDb = dict(iter_card_entries(db_path, names))
+            return
+
         with open(db_path, encoding='utf-8') as dbFile:
             db = json.load(dbFile)
             self.cardDb = db
     def getDb(self):
         return self.cardDb
 
+    def close(self):
+        """Close the compiled store the cards were loaded from, if any."""
+        close = getattr(self.cardDb, 'close', None)
+        if close is not None:
+            close()
+
 class CardModel:
     def __init__(self, name=None, db=None):
         self.headerText = "HEADER"
@@ -124,6 +280,32 @@ class CardModel:
     def __str__(self):
         return f'{self.headerText} - {self.get_command_points_display()} ({self.typeStr})'
 
+    def compile(self) -> 'CardRecord':
+        """Return an immutable record of this card ready for rendering."""
+        return CardRecord(self)
+
+    def render_key(self):
+        """Return a hashable key covering every attribute that affects the drawn card."""
+        return (
+            self.headerText,
+            self.headerColour,
+            self.headerBanner,
+            self.headerBannerColour,
+            self.typeStr,
+            self.cardText,
+            self.cardTextColour,
+            self.commandPoints,
+            self.commandPointsSecondary,
+            self.power,
+            self.toughness,
+            self.image,
+            self.imageFullFrame,
+            self.footerText,
+            self.footerColour,
+            self.footerFontStyle,
+            self.backgroundColour,
+        )
+
     def get_text_color_rgb(self):
         return self._hex_to_rgb(self.cardTextColour, default=(0.0, 0.0, 0.0))
 
@@ -223,3 +405,92 @@ class CardModel:
         if primary is None:
             primary = 0
         return (primary, None)
+
+
+class CardRecord:
+    """Immutable, compiled card shared by every copy of that card in a deck.
+
+    Colours, the command points display and the render key are resolved once
+    when the record is built, so drawing a card does no parsing.
+    """
+
+    _FIELDS = (
+        'headerText',
+        'headerColour',
+        'headerBanner',
+        'headerBannerColour',
+        'typeStr',
+        'cardText',
+        'cardTextColour',
+        'commandPoints',
+        'commandPointsSecondary',
+        'power',
+        'toughness',
+        'image',
+        'imageFullFrame',
+        'footerText',
+        'footerColour',
+        'footerFontStyle',
+        'backgroundColour',
+    )
+    _RESOLVED = (
+        'textColourRgb',
+        'headerColourRgb',
+        'headerBannerColourRgb',
+        'footerColourRgb',
+        'backgroundColourRgb',
+        'commandPointsDisplay',
+        'renderKey',
+    )
+    __slots__ = _FIELDS + _RESOLVED
+
+    def __init__(self, card: CardModel):
+        values = [getattr(card, field) for field in self._FIELDS]
+        values += [
+            card.get_text_color_rgb(),
+            card.get_header_text_color_rgb(),
+            card.get_header_banner_color_rgb(),
+            card.get_footer_text_color_rgb(),
+            card.get_background_color_rgb(),
+            card.get_command_points_display(),
+            card.render_key(),
+        ]
+        self.__setstate__(tuple(values))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    def __getstate__(self):
+        return tuple(getattr(self, slot) for slot in self.__slots__)
+
+    def __setstate__(self, state):
+        for slot, value in zip(self.__slots__, state):
+            object.__setattr__(self, slot, value)
+
+    def __str__(self):
+        return f'{self.headerText} - {self.commandPointsDisplay} ({self.typeStr})'
+
+    @property
+    def nameStr(self):
+        return self.headerText
+
+    def get_text_color_rgb(self):
+        return self.textColourRgb
+
+    def get_header_text_color_rgb(self):
+        return self.headerColourRgb
+
+    def get_header_banner_color_rgb(self):
+        return self.headerBannerColourRgb
+
+    def get_footer_text_color_rgb(self):
+        return self.footerColourRgb
+
+    def get_background_color_rgb(self):
+        return self.backgroundColourRgb
+
+    def get_command_points_display(self) -> str:
+        return self.commandPointsDisplay
+
+    def render_key(self):
+        return self.renderKey
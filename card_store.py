@@ -0,0 +1,220 @@
+import hashlib
+import json
+import pathlib
+import sqlite3
+import threading
+from collections.abc import Mapping
+from typing import Iterator, List, Optional, Tuple, Union
+
+from card_model import iter_card_entries
+from utils import atomic_write, file_digest
+
+# Bump when the table layout changes so existing stores are rebuilt.
+STORE_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE cards (
+    name TEXT PRIMARY KEY,
+    header TEXT NOT NULL,
+    type TEXT NOT NULL,
+    text TEXT NOT NULL,
+    entry TEXT NOT NULL
+);
+"""
+
+
+def _source_digest(path: pathlib.Path) -> str:
+    digest = file_digest(path)
+    if digest is None:
+        raise OSError(f'cannot read {path}')
+    return digest
+
+
+def _searchable_fields(name: str, entry) -> Tuple[str, str, str]:
+    if not isinstance(entry, dict):
+        return (name, '', '')
+
+    header = entry.get('header') or {}
+    header_text = header.get('text') if isinstance(header, dict) else None
+    header_text = header_text or entry.get('name') or name
+
+    type_str = str(entry.get('type', ''))
+    if 'subtype' in entry:
+        type_str = f"{type_str} - {entry['subtype']}"
+
+    card_text = entry.get('card_text')
+    if isinstance(card_text, dict):
+        text = card_text.get('text', '')
+    else:
+        text = entry.get('text', '')
+
+    return (str(header_text), type_str, str(text or ''))
+
+
+def default_store_path(json_path: Union[pathlib.Path, str], cache_dir: Union[pathlib.Path, str]) -> pathlib.Path:
+    """Return where the compiled store for ``json_path`` lives inside ``cache_dir``."""
+    json_path = pathlib.Path(json_path).resolve()
+    suffix = hashlib.sha256(str(json_path).encode('utf-8')).hexdigest()[:12]
+    return pathlib.Path(cache_dir) / f'{json_path.stem}-{suffix}.sqlite'
+
+
+def _read_only_uri(store_path: pathlib.Path) -> str:
+    return f'{store_path.resolve().as_uri()}?mode=ro'
+
+
+def _read_meta(store_path: pathlib.Path) -> dict:
+    try:
+        connection = sqlite3.connect(_read_only_uri(store_path), uri=True)
+    except sqlite3.Error:
+        return {}
+
+    try:
+        return dict(connection.execute('SELECT key, value FROM meta'))
+    except sqlite3.Error:
+        return {}
+    finally:
+        connection.close()
+
+
+def _write_store(json_path: pathlib.Path, store_path: pathlib.Path, meta: dict) -> None:
+    store_path.parent.mkdir(parents=True, exist_ok=True)
+    with atomic_write(store_path) as temporary:
+        connection = sqlite3.connect(str(temporary))
+        try:
+            connection.executescript(_SCHEMA)
+            connection.executemany(
+                'INSERT OR REPLACE INTO cards (name, header, type, text, entry) VALUES (?, ?, ?, ?, ?)',
+                (
+                    (name, *_searchable_fields(name, entry), json.dumps(entry, ensure_ascii=False))
+                    for name, entry in iter_card_entries(json_path)
+                ),
+            )
+            connection.executemany('INSERT INTO meta (key, value) VALUES (?, ?)', meta.items())
+            connection.commit()
+        finally:
+            connection.close()
+
+
+def compile_cards(
+    json_path: Union[pathlib.Path, str],
+    store_path: Union[pathlib.Path, str],
+) -> pathlib.Path:
+    """Compile a cards JSON file into an indexed SQLite store.
+
+    The store is only rebuilt when the source file changed: matching
+    modification time and size are trusted, otherwise the content hash
+    decides.
+    """
+    json_path = pathlib.Path(json_path)
+    store_path = pathlib.Path(store_path)
+    stat = json_path.stat()
+    meta = {
+        'version': str(STORE_VERSION),
+        'mtime_ns': str(stat.st_mtime_ns),
+        'size': str(stat.st_size),
+    }
+
+    existing = _read_meta(store_path)
+    if existing.get('version') == meta['version']:
+        if existing.get('mtime_ns') == meta['mtime_ns'] and existing.get('size') == meta['size']:
+            return store_path
+
+        meta['sha256'] = _source_digest(json_path)
+        if existing.get('sha256') == meta['sha256']:
+            connection = sqlite3.connect(str(store_path))
+            try:
+                connection.executemany('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', meta.items())
+                connection.commit()
+            finally:
+                connection.close()
+            return store_path
+    else:
+        meta['sha256'] = _source_digest(json_path)
+
+    _write_store(json_path, store_path, meta)
+    return store_path
+
+
+class CardStore(Mapping):
+    """Read-only mapping of card names to entries backed by a compiled store."""
+
+    def __init__(self, store_path: Union[pathlib.Path, str]):
+        self.path = pathlib.Path(store_path)
+        self._connection = sqlite3.connect(
+            _read_only_uri(self.path),
+            uri=True,
+            check_same_thread=False,
+        )
+        self._lock = threading.Lock()
+
+    def _query(self, sql: str, parameters=()) -> List[tuple]:
+        with self._lock:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def __getitem__(self, name: str):
+        rows = self._query('SELECT entry FROM cards WHERE name = ?', (name,))
+        if not rows:
+            raise KeyError(name)
+        return json.loads(rows[0][0])
+
+    def __contains__(self, name) -> bool:
+        return bool(self._query('SELECT 1 FROM cards WHERE name = ?', (name,)))
+
+    def __iter__(self) -> Iterator[str]:
+        return iter([row[0] for row in self._query('SELECT name FROM cards ORDER BY rowid')])
+
+    def __len__(self) -> int:
+        return self._query('SELECT COUNT(*) FROM cards')[0][0]
+
+    def items(self):
+        return [
+            (name, json.loads(entry))
+            for name, entry in self._query('SELECT name, entry FROM cards ORDER BY rowid')
+        ]
+
+    def values(self):
+        return [entry for _, entry in self.items()]
+
+    def search(
+        self,
+        *,
+        name: Optional[str] = None,
+        type_str: Optional[str] = None,
+        text: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[Tuple[str, str, str]]:
+        """Return ``(name, header, type)`` rows containing every given substring."""
+        clauses = []
+        parameters = []
+        if name:
+            clauses.append('(name LIKE ? OR header LIKE ?)')
+            parameters.extend([f'%{name}%', f'%{name}%'])
+        if type_str:
+            clauses.append('type LIKE ?')
+            parameters.append(f'%{type_str}%')
+        if text:
+            clauses.append('text LIKE ?')
+            parameters.append(f'%{text}%')
+
+        sql = 'SELECT name, header, type FROM cards'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY rowid'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            parameters.append(limit)
+
+        return self._query(sql, parameters)
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+def open_card_store(
+    json_path: Union[pathlib.Path, str],
+    cache_dir: Union[pathlib.Path, str],
+) -> CardStore:
+    """Compile ``json_path`` into ``cache_dir`` if needed and open the store."""
+    store_path = default_store_path(json_path, cache_dir)
+    return CardStore(compile_cards(json_path, store_path))
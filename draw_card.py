@@ -1,6 +1,115 @@
+from collections import OrderedDict
+from typing import List, Tuple
+
 import cairo
 import card_model
+import fonts
 import layout
+import profiling
+
+# Ink metrics (x_bearing, width, x_advance) of recently measured words, keyed
+# by font and word.
+_WORD_METRICS: 'OrderedDict[tuple, Tuple[float, float, float]]' = OrderedDict()
+_WORD_METRICS_MAX_ENTRIES = 16384
+
+# Wrapped layouts keyed by text, font, width and line height.
+_WRAPPED_TEXT: 'OrderedDict[tuple, Tuple[Tuple[str, float], ...]]' = OrderedDict()
+_WRAPPED_TEXT_MAX_ENTRIES = 4096
+
+
+def _font_key(ctx: cairo.Context) -> tuple:
+    """Identify the current font, size and device scale of a context."""
+    face = ctx.get_font_face()
+    if isinstance(face, cairo.ToyFontFace):
+        face_key = (face.get_family(), face.get_slant(), face.get_weight())
+    else:
+        face_key = (id(face),)
+
+    font_matrix = ctx.get_font_matrix()
+    ctm = ctx.get_matrix()
+    return face_key + (
+        font_matrix.xx, font_matrix.yx, font_matrix.xy, font_matrix.yy,
+        ctm.xx, ctm.yx, ctm.xy, ctm.yy,
+    )
+
+
+def _word_metrics(ctx: cairo.Context, font_key: tuple):
+    def measure(word: str) -> Tuple[float, float, float]:
+        key = (font_key, word)
+        cached = _WORD_METRICS.get(key)
+        if cached is not None:
+            _WORD_METRICS.move_to_end(key)
+            return cached
+
+        extents = ctx.text_extents(word)
+        cached = _WORD_METRICS[key] = (extents.x_bearing, extents.width, extents.x_advance)
+        if len(_WORD_METRICS) > _WORD_METRICS_MAX_ENTRIES:
+            _WORD_METRICS.popitem(last=False)
+        return cached
+
+    return measure
+
+
+def wrapText(
+    ctx: cairo.Context,
+    text: str,
+    maxWidth: float,
+    lineHeight: float,
+) -> Tuple[Tuple[str, float], ...]:
+    """Split ``text`` into lines no wider than ``maxWidth`` in the current font.
+
+    Returns ``(line, offset)`` pairs where ``offset`` is the baseline distance
+    from the first line. Each word is measured once per font and line widths
+    are summed incrementally, so wrapping is linear in the number of words.
+    """
+    font_key = _font_key(ctx)
+    cache_key = (text, font_key, maxWidth, lineHeight)
+    wrapped = _WRAPPED_TEXT.get(cache_key)
+    if wrapped is not None:
+        _WRAPPED_TEXT.move_to_end(cache_key)
+        return wrapped
+
+    measure = _word_metrics(ctx, font_key)
+    space_advance = measure(' ')[2]
+
+    lines: List[Tuple[str, float]] = []
+    currentOffset = 0.0
+
+    for inputLine in text.split('\n'):
+        currentLine: List[str] = []
+        # Pen position after the last word of the line and ink start of its
+        # first word.
+        advance = 0.0
+        firstBearing = 0.0
+
+        for word in inputLine.split(' '):
+            x_bearing, width, x_advance = measure(word)
+
+            if currentLine:
+                start = advance + space_advance
+                lineWidth = start + x_bearing + width - firstBearing
+                if lineWidth > maxWidth:
+                    lines.append((' '.join(currentLine), currentOffset))
+                    currentOffset = currentOffset + lineHeight
+                    currentLine = []
+
+            if currentLine:
+                currentLine.append(word)
+                advance = start + x_advance
+            else:
+                currentLine = [word]
+                advance = x_advance
+                firstBearing = x_bearing
+
+        lines.append((' '.join(currentLine), currentOffset))
+        currentOffset = currentOffset + lineHeight * 1.4
+
+    wrapped = tuple(lines)
+    _WRAPPED_TEXT[cache_key] = wrapped
+    if len(_WRAPPED_TEXT) > _WRAPPED_TEXT_MAX_ENTRIES:
+        _WRAPPED_TEXT.popitem(last=False)
+    return wrapped
+
 
 def showWrappedText(
     ctx: cairo.Context,
@@ -11,30 +120,11 @@ def showWrappedText(
     lineHeight=12.0
 ):
     maxWidth = right - left
-    inputLines = text.split('\n')
-    inputWords = [line.split(' ') for line in inputLines]
-    
-    currentOffset = 0
-
-    for line in inputWords:
-        currentLine = []
-
-        while len(line):
-            nextWord = line.pop(0)
-            nextLine = currentLine + [nextWord]
-
-            if (ctx.text_extents(' '.join(nextLine)).width > maxWidth):
-                ctx.move_to(left, top + currentOffset)
-                ctx.show_text(' '.join(currentLine))
-                currentLine = [nextWord]
-                currentOffset = currentOffset + lineHeight
-            else:
-                currentLine = nextLine
-        
-        if (len(currentLine)):
-            ctx.move_to(left, top + currentOffset)
-            ctx.show_text(' '.join(currentLine))
-            currentOffset = currentOffset + lineHeight * 1.4
+
+    with profiling.span('wrapText', 'text'):
+        for line, offset in wrapText(ctx, text, maxWidth, lineHeight):
+            ctx.move_to(left, top + offset)
+            ctx.show_text(line)
 
 
 def drawCard(
@@ -50,12 +140,10 @@ def drawCard(
         ctx.paint()
 
 
-    ctx.select_font_face('serif')
-
     header_color = card.get_header_text_color_rgb()
     body_color = card.get_text_color_rgb()
 
-    ctx.set_font_size(layout.nameH)
+    fonts.use_font(ctx, fonts.REGULAR, layout.nameH)
 
     if card.headerBanner:
         header_text = card.headerText or ''
@@ -80,13 +168,13 @@ def drawCard(
 
     # Draw type
     ctx.set_source_rgb(*body_color)
-    ctx.set_font_size(layout.typeH)
+    fonts.use_font(ctx, fonts.REGULAR, layout.typeH)
     ctx.move_to(*layout.typeBL)
     ctx.show_text(card.typeStr)
 
     # Draw cardText
     ctx.set_source_rgb(*body_color)
-    ctx.set_font_size(layout.cardTextH)
+    fonts.use_font(ctx, fonts.REGULAR, layout.cardTextH)
     showWrappedText(ctx, card.cardText,
         top=layout.cardTextBL[1],
         left=layout.cardTextBL[0],
@@ -98,7 +186,7 @@ def drawCard(
     if card.power is not None:
         ptStr = str(card.power) + '/' + str(card.toughness)
         ctx.set_source_rgb(*body_color)
-        ctx.set_font_size(layout.ptH)
+        fonts.use_font(ctx, fonts.REGULAR, layout.ptH)
         ctx.move_to(*layout.ptBL)
         ctx.show_text(ptStr)
 
@@ -116,7 +204,7 @@ def drawCard(
 
     shield_values.append((card.commandPoints, base_shield_x, False))
 
-    ctx.select_font_face('serif', cairo.FONT_SLANT_NORMAL, cairo.FONT_WEIGHT_BOLD)
+    fonts.use_font(ctx, fonts.BOLD, layout.commandPointsFontSize)
     for value, shield_x, invert in shield_values:
         ctx.save()
         ctx.move_to(shield_x, shield_y)
@@ -141,7 +229,6 @@ def drawCard(
             ctx.stroke()
             text_color = (0.0, 0.0, 0.0)
 
-        ctx.set_font_size(layout.commandPointsFontSize)
         text = str(value)
         extents = ctx.text_extents(text)
         center_x = shield_x + shield_width / 2.0
@@ -154,25 +241,21 @@ def drawCard(
         ctx.show_text(text)
         ctx.restore()
 
-    ctx.select_font_face('serif')
     ctx.restore()
 
     # Draw footer text
     if card.footerText:
-        footer_slant = cairo.FONT_SLANT_NORMAL
-        footer_weight = cairo.FONT_WEIGHT_NORMAL
+        footer_style = fonts.REGULAR
 
         if card.footerFontStyle == 'italic':
-            footer_slant = cairo.FONT_SLANT_ITALIC
+            footer_style = fonts.ITALIC
         if card.footerFontStyle == 'bold':
-            footer_weight = cairo.FONT_WEIGHT_BOLD
+            footer_style = fonts.BOLD
 
         ctx.set_source_rgb(*card.get_footer_text_color_rgb())
-        ctx.set_font_size(layout.footerH)
-        ctx.select_font_face('serif', footer_slant, footer_weight)
+        fonts.use_font(ctx, footer_style, layout.footerH)
         ctx.move_to(*layout.footerBL)
         ctx.show_text(card.footerText)
-        ctx.select_font_face('serif')
 
 
     ctx.restore()
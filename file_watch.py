@@ -0,0 +1,70 @@
+import os
+import pathlib
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+Snapshot = Dict[str, Tuple[int, int]]
+
+
+def snapshot(paths: Iterable[Union[pathlib.Path, str]]) -> Snapshot:
+    """Return the modification time and size of every existing file in ``paths``.
+
+    Directories are expanded to the files they contain, so files added to or
+    removed from them show up as changes.
+    """
+    state: Snapshot = {}
+    for path in paths:
+        path = pathlib.Path(path)
+        if path.is_dir():
+            with os.scandir(path) as entries:
+                files = [pathlib.Path(entry.path) for entry in entries if entry.is_file()]
+        else:
+            files = [path]
+
+        for file_path in files:
+            try:
+                stat = file_path.stat()
+            except OSError:
+                continue
+            state[str(file_path)] = (stat.st_mtime_ns, stat.st_size)
+
+    return state
+
+
+def changed_paths(before: Snapshot, after: Snapshot) -> List[str]:
+    """Return the files added, removed or modified between two snapshots."""
+    return sorted(path for path in before.keys() | after.keys() if before.get(path) != after.get(path))
+
+
+def watch(
+    list_paths: Callable[[], Iterable[Union[pathlib.Path, str]]],
+    on_change: Callable[[List[str]], None],
+    *,
+    interval: float = 0.25,
+    settle: float = 0.1,
+    should_stop: Optional[Callable[[], bool]] = None,
+) -> None:
+    """Poll the files returned by ``list_paths`` and call ``on_change`` with what changed.
+
+    ``list_paths`` is called on every poll so the watched set can follow the
+    inputs, e.g. a new image referenced by the cards. A change is only
+    reported once the files stop changing for ``settle`` seconds, so editors
+    that save in several writes trigger a single call.
+    """
+    previous = snapshot(list_paths())
+    while should_stop is None or not should_stop():
+        time.sleep(interval)
+        current = snapshot(list_paths())
+        if current == previous:
+            continue
+
+        while True:
+            time.sleep(settle)
+            settled = snapshot(list_paths())
+            if settled == current:
+                break
+            current = settled
+
+        changed = changed_paths(previous, current)
+        previous = current
+        on_change(changed)
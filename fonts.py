@@ -0,0 +1,154 @@
+import ctypes
+import ctypes.util
+import functools
+import os
+import pathlib
+from typing import Dict, Iterable, Optional, Tuple
+
+import cairo
+
+import layout
+
+REGULAR = 'regular'
+BOLD = 'bold'
+ITALIC = 'italic'
+
+_STYLES = {
+    REGULAR: (cairo.FONT_SLANT_NORMAL, cairo.FONT_WEIGHT_NORMAL),
+    BOLD: (cairo.FONT_SLANT_NORMAL, cairo.FONT_WEIGHT_BOLD),
+    ITALIC: (cairo.FONT_SLANT_ITALIC, cairo.FONT_WEIGHT_NORMAL),
+}
+
+# The fontconfig slant and weight cairo asks for with each style.
+_FC_STYLES = {
+    REGULAR: (0, 100),
+    BOLD: (0, 200),
+    ITALIC: (100, 100),
+}
+_FC_MATCH_PATTERN = 0
+_FC_RESULT_MATCH = 0
+
+
+@functools.lru_cache(maxsize=None)
+def _fontconfig() -> ctypes.CDLL:
+    library_name = ctypes.util.find_library('fontconfig')
+    if library_name is None:
+        raise RuntimeError(
+            'layout.FONT_FILES needs the fontconfig library, which is not available on this '
+            'system (e.g. Windows); leave FONT_FILES empty and install the fonts instead'
+        )
+
+    fontconfig = ctypes.CDLL(library_name)
+    fontconfig.FcConfigAppFontAddFile.argtypes = [ctypes.c_void_p, ctypes.c_char_p]
+    fontconfig.FcNameParse.argtypes = [ctypes.c_char_p]
+    fontconfig.FcNameParse.restype = ctypes.c_void_p
+    fontconfig.FcConfigSubstitute.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int]
+    fontconfig.FcDefaultSubstitute.argtypes = [ctypes.c_void_p]
+    fontconfig.FcDefaultSubstitute.restype = None
+    fontconfig.FcFontMatch.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.POINTER(ctypes.c_int)]
+    fontconfig.FcFontMatch.restype = ctypes.c_void_p
+    fontconfig.FcPatternGetString.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int, ctypes.POINTER(ctypes.c_char_p)]
+    fontconfig.FcPatternDestroy.argtypes = [ctypes.c_void_p]
+    fontconfig.FcPatternDestroy.restype = None
+    return fontconfig
+
+
+def font_file_path(path) -> pathlib.Path:
+    """Resolve an entry of ``layout.FONT_FILES``, relative paths against ``layout.py``."""
+    font_path = pathlib.Path(path)
+    if (not font_path.is_absolute()) and (not font_path.exists()):
+        font_path = pathlib.Path(layout.__file__).parent / font_path
+    return font_path
+
+
+def register_font_file(path) -> pathlib.Path:
+    """Make a font file available to cairo through fontconfig and return its path."""
+    font_path = font_file_path(path)
+    if not _fontconfig().FcConfigAppFontAddFile(None, os.fsencode(str(font_path))):
+        raise RuntimeError(f'Cannot load font file {font_path}')
+    return font_path
+
+
+def matched_font_file(family: str, style: str) -> Optional[str]:
+    """Return the file fontconfig picks for ``family`` in ``style``, as cairo's toy faces do."""
+    fontconfig = _fontconfig()
+    escaped = ''.join('\\' + char if char in '\\-:,' else char for char in family)
+    slant, weight = _FC_STYLES[style]
+    pattern = fontconfig.FcNameParse(f'{escaped}:slant={slant}:weight={weight}'.encode('utf-8'))
+    if not pattern:
+        return None
+
+    try:
+        fontconfig.FcConfigSubstitute(None, pattern, _FC_MATCH_PATTERN)
+        fontconfig.FcDefaultSubstitute(pattern)
+        result = ctypes.c_int()
+        match = fontconfig.FcFontMatch(None, pattern, ctypes.byref(result))
+    finally:
+        fontconfig.FcPatternDestroy(pattern)
+    if not match:
+        return None
+
+    try:
+        file_name = ctypes.c_char_p()
+        if fontconfig.FcPatternGetString(match, b'file', 0, ctypes.byref(file_name)) != _FC_RESULT_MATCH:
+            return None
+        return os.fsdecode(file_name.value)
+    finally:
+        fontconfig.FcPatternDestroy(match)
+
+
+class FontRegistry:
+    """Font faces resolved once, with a reusable scaled font per style and size."""
+
+    def __init__(self, family: str = layout.FONT_FAMILY, font_files: Iterable = layout.FONT_FILES):
+        registered = {os.path.realpath(register_font_file(path)) for path in font_files}
+        # With font files, every style must come from them, never from a
+        # system font fontconfig substituted for an unknown family.
+        for style in _STYLES if registered else ():
+            matched = matched_font_file(family, style)
+            if matched is None or os.path.realpath(matched) not in registered:
+                raise RuntimeError(
+                    f'The {style} style of font family {family!r} resolves to {matched}, '
+                    'not to one of layout.FONT_FILES; set layout.FONT_FAMILY to the family those files contain'
+                )
+
+        self.faces = {
+            style: cairo.ToyFontFace(family, slant, weight)
+            for style, (slant, weight) in _STYLES.items()
+        }
+        self.options = cairo.FontOptions()
+        self._scaled_fonts: Dict[Tuple, cairo.ScaledFont] = {}
+
+    def scaled_font(self, style: str, size: float, ctm: cairo.Matrix) -> cairo.ScaledFont:
+        """Return the scaled font for ``style`` at ``size`` under the given transformation."""
+        # Translation does not affect glyph rendering, so it is left out.
+        key = (style, size, ctm.xx, ctm.yx, ctm.xy, ctm.yy)
+        font = self._scaled_fonts.get(key)
+        if font is None:
+            font = cairo.ScaledFont(
+                self.faces[style],
+                cairo.Matrix(xx=size, yy=size),
+                cairo.Matrix(xx=ctm.xx, yx=ctm.yx, xy=ctm.xy, yy=ctm.yy),
+                self.options,
+            )
+            self._scaled_fonts[key] = font
+        return font
+
+    def use(self, ctx: cairo.Context, style: str, size: float) -> None:
+        """Select ``style`` at ``size`` on ``ctx`` for its current transformation."""
+        ctx.set_scaled_font(self.scaled_font(style, size, ctx.get_matrix()))
+
+
+_registry: Optional[FontRegistry] = None
+
+
+def get_registry() -> FontRegistry:
+    """Return the process-wide registry built from the layout font settings."""
+    global _registry
+    if _registry is None:
+        _registry = FontRegistry()
+    return _registry
+
+
+def use_font(ctx: cairo.Context, style: str, size: float) -> None:
+    get_registry().use(ctx, style, size)
@@ -1,11 +1,21 @@
+import functools
+import hashlib
 import math
+import os
 import pathlib
+from typing import Optional, Sequence
 
 import cairo
+import numpy as np
+
+import profiling
+from surface_cache import SurfacePool
 
 # Measurement helpers
 MM_PER_INCH = 25.4
 
+DEFAULT_LAYOUT_PATH = pathlib.Path(__file__).parent / 'layout.png'
+
 
 # All dimensions are in mm
 # Card Measurements
@@ -43,6 +53,12 @@ commandPointsFontSize = 3.6
 commandPointsBorderWidth = 0.45
 commandPointsShieldGap = 1.0
 
+# Fonts
+FONT_FAMILY = 'serif'
+# Optional font files (relative to this module or absolute) registered before
+# FONT_FAMILY is resolved, so rendering does not depend on installed fonts.
+FONT_FILES = ()
+
 
 def mm_to_pixels(value_mm: float, dpi: float) -> int:
     """Convert a millimetre measurement to whole pixels for a given DPI."""
@@ -54,8 +70,123 @@ def pair_mm_to_pixels(pair_mm, dpi: float):
     return tuple(mm_to_pixels(v, dpi) for v in pair_mm)
 
 
-def getSurface() -> cairo.ImageSurface:
-    return cairo.ImageSurface.create_from_png(pathlib.Path(__file__).parent / 'layout.png')
+def constants_fingerprint() -> str:
+    """Return a digest of the layout constants defined in this module."""
+    constants = sorted(
+        (name, repr(value))
+        for name, value in globals().items()
+        if not name.startswith('_') and isinstance(value, (int, float, str, tuple))
+    )
+    return hashlib.sha256(repr(constants).encode('utf-8')).hexdigest()
+
+
+# Grey levels of the default layout frame replaced by --rgb.
+FRAME_GREY_RANGE = (190, 252)
+
+
+def surface_pixels(surface: cairo.ImageSurface) -> np.ndarray:
+    """Return a writable ``(height, width, 4)`` BGRA view over a surface buffer."""
+    surface.flush()
+    width = surface.get_width()
+    height = surface.get_height()
+    stride = surface.get_stride()
+    data = np.ndarray(
+        shape=(height, stride // 4, 4),
+        dtype=np.uint8,
+        buffer=surface.get_data(),
+    )
+    return data[:, :width]
+
+
+def copy_surface(surface: cairo.ImageSurface, pool: Optional[SurfacePool] = None) -> cairo.ImageSurface:
+    """Return an image surface holding a memory copy of the pixels of ``surface``.
+
+    With ``pool`` the copy reuses a pooled surface, to be released by the caller.
+    """
+    surface.flush()
+    if pool is None:
+        copy = cairo.ImageSurface(surface.get_format(), surface.get_width(), surface.get_height())
+    else:
+        copy = pool.acquire(surface.get_width(), surface.get_height(), surface.get_format(), clear=False)
+    copy.get_data()[:] = surface.get_data()
+    copy.mark_dirty()
+    return copy
+
+
+def recolour_frame(surface: cairo.ImageSurface, rgb: Sequence[int]) -> None:
+    """Replace the opaque grey frame pixels of a layout surface with ``rgb`` in place."""
+    pixels = surface_pixels(surface)
+    blue, green, red, alpha = (pixels[..., channel] for channel in range(4))
+
+    frame = (red == green) & (green == blue)
+    frame &= (red >= FRAME_GREY_RANGE[0]) & (red <= FRAME_GREY_RANGE[1])
+    if surface.get_format() == cairo.FORMAT_ARGB32:
+        frame &= alpha == 255
+
+    pixels[frame, :3] = (rgb[2], rgb[1], rgb[0])
+    surface.mark_dirty()
+
+
+def scale_surface(surface: cairo.ImageSurface, width: int, height: int) -> cairo.ImageSurface:
+    """Return a new surface holding ``surface`` resampled to ``width`` x ``height`` pixels."""
+    scaled = cairo.ImageSurface(surface.get_format(), width, height)
+    pattern = cairo.SurfacePattern(surface)
+    pattern.set_filter(cairo.FILTER_GOOD)
+    ctx = cairo.Context(scaled)
+    ctx.scale(width / surface.get_width(), height / surface.get_height())
+    ctx.set_source(pattern)
+    ctx.set_operator(cairo.OPERATOR_SOURCE)
+    ctx.paint()
+    return scaled
+
+
+@functools.lru_cache(maxsize=8)
+def _load_template(path: str, rgb, dpi=None, version=None) -> cairo.ImageSurface:
+    # ``version`` only keys the cache, so an edited layout file is decoded again.
+    if dpi is not None:
+        # Recolour at full resolution, where the frame greys are still exact.
+        template = _load_template(path, rgb, None, version)
+        size = (round(8.5 * dpi), round(11 * dpi))
+        if size == (template.get_width(), template.get_height()):
+            return template
+        with profiling.span('scaleLayout', 'layout'):
+            return scale_surface(template, *size)
+
+    with profiling.span('decodeLayout', 'layout'):
+        template = cairo.ImageSurface.create_from_png(path)
+    if rgb is not None:
+        with profiling.span('recolour', 'layout'):
+            recolour_frame(template, rgb)
+    return template
+
+
+def get_template(rgb: Optional[Sequence[int]] = None, path=None, dpi: Optional[float] = None) -> cairo.ImageSurface:
+    """Return the shared, decoded layout template; callers must not draw on it.
+
+    ``path`` selects a custom layout PNG, ``rgb`` recolours the frame and
+    ``dpi`` resamples the page to that resolution instead of the PNG's own.
+    Each template is decoded (and recoloured) once per process, and worker
+    processes forked after the first call inherit it. Editing the file
+    invalidates it.
+    """
+    path = str(path or DEFAULT_LAYOUT_PATH)
+    try:
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        version = None
+
+    return _load_template(path, tuple(rgb) if rgb is not None else None, dpi, version)
+
+
+def getSurface(
+    rgb: Optional[Sequence[int]] = None,
+    path=None,
+    dpi: Optional[float] = None,
+    pool: Optional[SurfacePool] = None,
+) -> cairo.ImageSurface:
+    """Return a fresh page surface copied from the layout template, from ``pool`` if given."""
+    return copy_surface(get_template(rgb, path, dpi), pool)
 
 
 def get_surface_dpi(surf: cairo.ImageSurface) -> float:
@@ -63,13 +194,11 @@ def get_surface_dpi(surf: cairo.ImageSurface) -> float:
     return surf.get_width() / 8.5
 
 
-def getMatrix(x: int, y: int, surf: cairo.ImageSurface):
-    sx = surf.get_width() / 8.5 / MM_PER_INCH
-    sy = surf.get_height() / 11 / MM_PER_INCH
-
-    x0 = (origin[0] + deltaX * x) * sx
-    y0 = (origin[1] + deltaY * y) * sy
-    return cairo.Matrix(x0=x0, y0=y0, xx=sx, yy=sy)
+def get_card_matrix(card_position, dpi: float):
+    """Return a matrix drawing a grid card in millimetres on a page at ``dpi``."""
+    scale = dpi / MM_PER_INCH
+    origin_mm = get_card_origin_mm(card_position)
+    return cairo.Matrix(xx=scale, yy=scale, x0=origin_mm[0] * scale, y0=origin_mm[1] * scale)
 
 
 def get_card_origin_mm(card_position):
@@ -80,10 +209,13 @@ def get_card_origin_mm(card_position):
     )
 
 
-def get_single_card_surface(dpi: int = SINGLE_CARD_DPI) -> cairo.ImageSurface:
-    """Create a blank single-card surface at the requested DPI."""
+def get_single_card_surface(dpi: int = SINGLE_CARD_DPI, pool: Optional[SurfacePool] = None) -> cairo.ImageSurface:
+    """Create a blank single-card surface at the requested DPI, or take a cleared one from ``pool``."""
     width_px = mm_to_pixels(CARD_WIDTH_MM, dpi)
     height_px = mm_to_pixels(CARD_HEIGHT_MM, dpi)
+    if pool is not None:
+        return pool.acquire(width_px, height_px, cairo.FORMAT_ARGB32)
+
     surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width_px, height_px)
     ctx = cairo.Context(surface)
     ctx.set_operator(cairo.OPERATOR_SOURCE)
@@ -94,10 +226,13 @@ def get_single_card_surface(dpi: int = SINGLE_CARD_DPI) -> cairo.ImageSurface:
     return surface
 
 
-def get_single_card_matrix(dpi: int = SINGLE_CARD_DPI):
-    """Return a scaling matrix to draw cards using millimetre coordinates."""
+def get_single_card_matrix(dpi: int = SINGLE_CARD_DPI, origin_px=(0, 0)):
+    """Return a scaling matrix to draw cards using millimetre coordinates.
+
+    ``origin_px`` places the card's top-left corner, e.g. in an atlas cell.
+    """
     scale = dpi / MM_PER_INCH
-    return cairo.Matrix(xx=scale, yy=scale)
+    return cairo.Matrix(xx=scale, yy=scale, x0=origin_px[0], y0=origin_px[1])
 
 
 def _rounded_rectangle_path(ctx: cairo.Context, x: float, y: float, width: float, height: float, radius: float):
@@ -123,23 +258,3 @@ def clip_card(
 
     _rounded_rectangle_path(ctx, 0, 0, width_mm, height_mm, radius_mm)
     ctx.clip()
-
-
-def clip_card_absolute(
-    ctx: cairo.Context,
-    origin_mm,
-    dpi: float,
-    *,
-    width_mm: float = CARD_WIDTH_MM,
-    height_mm: float = CARD_HEIGHT_MM,
-    radius_mm: float = CARD_CORNER_RADIUS_MM,
-):
-    """Clip the context to a card positioned on the page using absolute millimetre coordinates."""
-
-    origin_px = tuple(value / MM_PER_INCH * dpi for value in origin_mm)
-    width_px = width_mm / MM_PER_INCH * dpi
-    height_px = height_mm / MM_PER_INCH * dpi
-    radius_px = radius_mm / MM_PER_INCH * dpi
-
-    _rounded_rectangle_path(ctx, origin_px[0], origin_px[1], width_px, height_px, radius_px)
-    ctx.clip()
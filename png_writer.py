@@ -0,0 +1,145 @@
+import io
+import os
+import pathlib
+import queue
+import threading
+from typing import Callable, Optional, Union
+
+import cairo
+import numpy as np
+from PIL import Image
+
+import layout
+import profiling
+
+# Lowest and highest zlib levels accepted by ``--png-compression``.
+MIN_COMPRESSION = 0
+MAX_COMPRESSION = 9
+
+
+def surface_to_array(surface: cairo.ImageSurface) -> np.ndarray:
+    """Return the pixels of an ``ARGB32`` or ``RGB24`` surface as a new ``uint8`` array.
+
+    The array is ``(height, width, 3)`` RGB for ``RGB24`` surfaces and
+    ``(height, width, 4)`` straight-alpha RGBA otherwise.
+    """
+    pixels = layout.surface_pixels(surface)
+
+    if surface.get_format() == cairo.FORMAT_RGB24:
+        return np.ascontiguousarray(pixels[..., 2::-1])
+
+    alpha = pixels[..., 3:].astype(np.uint16)
+    rgb = pixels[..., 2::-1].astype(np.uint16)
+    rgb = (rgb * 255 + alpha // 2) // np.maximum(alpha, 1)
+    return np.concatenate((np.minimum(rgb, 255), alpha), axis=2).astype(np.uint8)
+
+
+def surface_to_image(surface: cairo.ImageSurface) -> Image.Image:
+    """Convert an ``ARGB32`` or ``RGB24`` surface into a straight-alpha PIL image."""
+    pixels = surface_to_array(surface)
+    return Image.fromarray(pixels, 'RGB' if pixels.shape[2] == 3 else 'RGBA')
+
+
+def write_png(
+    surface: cairo.ImageSurface,
+    path: Union[pathlib.Path, str],
+    compression: Optional[int] = None,
+) -> None:
+    """Write ``surface`` as a PNG file.
+
+    Without ``compression`` cairo's own encoder is used; otherwise the pixels
+    are handed to Pillow, which lets the zlib level be chosen.
+    """
+    # Deduplicated pages may be hard links to each other; writing in place
+    # would change every link at once.
+    try:
+        if os.stat(path).st_nlink > 1:
+            os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+    with profiling.span('encode', 'output', path=str(path)):
+        if compression is None:
+            surface.write_to_png(str(path))
+        else:
+            surface_to_image(surface).save(str(path), format='PNG', compress_level=compression)
+
+
+def encode_png(surface: cairo.ImageSurface, compression: Optional[int] = None) -> bytes:
+    """Return ``surface`` encoded as PNG bytes, without touching the disk."""
+    buffer = io.BytesIO()
+    with profiling.span('encode', 'output'):
+        if compression is None:
+            surface.write_to_png(buffer)
+        else:
+            surface_to_image(surface).save(buffer, format='PNG', compress_level=compression)
+    return buffer.getvalue()
+
+
+class PngWriter:
+    """Background thread encoding PNG files while the caller keeps drawing.
+
+    At most ``max_pending`` surfaces wait in the queue, so a slow disk makes
+    ``submit`` block instead of piling up finished pages in memory. The first
+    error raised by the writer is re-raised by ``close``.
+    """
+
+    def __init__(self, compression: Optional[int] = None, max_pending: int = 2):
+        self.compression = compression
+        self._queue: 'queue.Queue' = queue.Queue(maxsize=max_pending)
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name='png-writer', daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            surface, path, release = item
+            try:
+                if self._error is None:
+                    write_png(surface, path, self.compression)
+            except BaseException as error:  # re-raised by close()
+                self._error = error
+            finally:
+                if release is not None:
+                    release(surface)
+
+    def submit(
+        self,
+        surface: cairo.ImageSurface,
+        path: Union[pathlib.Path, str],
+        release: Optional[Callable[[cairo.ImageSurface], None]] = None,
+    ) -> None:
+        """Queue ``surface`` to be written to ``path``; the caller must not draw on it again.
+
+        ``release`` is called with the surface once it has been written (or
+        skipped after an error), e.g. to return it to a ``SurfacePool``.
+        """
+        if self._error is not None:
+            if release is not None:
+                release(surface)
+            raise self._error
+        self._queue.put((surface, os.fspath(path), release))
+
+    def close(self) -> None:
+        """Wait until every queued surface has been written."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self) -> 'PngWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            # Keep the original exception; still drain what was queued.
+            self._queue.put(None)
+            self._thread.join()
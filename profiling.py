@@ -0,0 +1,122 @@
+import contextlib
+import json
+import os
+import pathlib
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Union
+
+# Chrome trace events recorded so far, or ``None`` while profiling is off.
+_EVENTS: Optional[List[dict]] = None
+
+_NULL_SPAN = contextlib.nullcontext()
+
+
+def enable() -> None:
+    """Start recording spans in this process, dropping anything recorded before."""
+    global _EVENTS
+    _EVENTS = []
+
+
+def disable() -> None:
+    global _EVENTS
+    _EVENTS = None
+
+
+def is_enabled() -> bool:
+    return _EVENTS is not None
+
+
+def take_events() -> List[dict]:
+    """Return the events recorded so far and start a new list."""
+    global _EVENTS
+    events = _EVENTS or []
+    if _EVENTS is not None:
+        _EVENTS = []
+    return events
+
+
+def add_events(events: List[dict]) -> None:
+    """Merge events recorded by another process."""
+    if _EVENTS is not None:
+        _EVENTS.extend(events)
+
+
+class _Span:
+    __slots__ = ('name', 'category', 'args', 'start')
+
+    def __init__(self, name: str, category: str, args: dict):
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = 0
+
+    def __enter__(self) -> '_Span':
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        end = time.perf_counter_ns()
+        if _EVENTS is not None:
+            _EVENTS.append({
+                'name': self.name,
+                'cat': self.category,
+                'ph': 'X',
+                'ts': self.start / 1000,
+                'dur': (end - self.start) / 1000,
+                'pid': os.getpid(),
+                'tid': threading.get_ident(),
+                'args': self.args,
+            })
+
+
+def span(name: str, category: str = 'render', **args):
+    """Time the enclosed block as one trace event; does nothing while profiling is off."""
+    if _EVENTS is None:
+        return _NULL_SPAN
+    return _Span(name, category, args)
+
+
+def call_collecting(function: Callable, *args):
+    """Run ``function`` with profiling on and return its result with the recorded events.
+
+    Used as the worker of a process pool, so events recorded in the workers
+    can be merged back into the parent trace.
+    """
+    enable()
+    try:
+        return function(*args), take_events()
+    finally:
+        disable()
+
+
+def write_trace(path: Union[pathlib.Path, str], events: List[dict]) -> None:
+    """Save ``events`` in the Chrome trace-event format (chrome://tracing, Perfetto)."""
+    with open(path, 'w', encoding='utf-8') as trace_file:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, trace_file)
+
+
+def summary(events: List[dict], slowest: int = 10) -> str:
+    """Return a table of total time per stage followed by the slowest cards."""
+    totals: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0])
+    for event in events:
+        total = totals[event['name']]
+        total[0] += 1
+        total[1] += event['dur'] / 1000
+
+    lines = [f"{'stage':<20} {'calls':>8} {'total ms':>12} {'mean ms':>10}"]
+    for name, (count, total_ms) in sorted(totals.items(), key=lambda item: -item[1][1]):
+        lines.append(f'{name:<20} {count:>8} {total_ms:>12.1f} {total_ms / count:>10.2f}')
+
+    cards = sorted(
+        (event for event in events if event['name'] == 'card'),
+        key=lambda event: -event['dur'],
+    )[:slowest]
+    if cards:
+        lines.append('')
+        lines.append(f"{'slowest cards':<40} {'ms':>10}")
+        for event in cards:
+            lines.append(f"{str(event['args'].get('card', '?')):<40.40} {event['dur'] / 1000:>10.1f}")
+
+    return '\n'.join(lines)
@@ -0,0 +1,142 @@
+"""Render decks in memory, for callers that want images instead of files.
+
+    from render_api import render_deck
+
+    for page in render_deck('cartas.json', 'mazo.csv', output='png'):
+        upload(f'page{page.index}.png', page.image)
+"""
+import csv
+import os
+import pathlib
+from collections.abc import Mapping
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import cairo
+import numpy as np
+
+import layout
+import LWCProto
+from card_model import CardDeck, CardModel, CardRecord
+from png_writer import encode_png, surface_to_array
+from render_cache import TileStore
+
+OUTPUT_FORMATS = ('surface', 'png', 'array')
+
+CardsSource = Union[str, os.PathLike, CardDeck, Mapping]
+DeckSource = Union[str, os.PathLike, Iterable[Sequence]]
+
+
+class RenderedImage(NamedTuple):
+    """One rendered page, or one card in single-card mode."""
+
+    index: int
+    cards: Tuple[CardRecord, ...]
+    image: Union[cairo.ImageSurface, bytes, np.ndarray]
+
+
+def _deck_rows(deck: DeckSource) -> List[Sequence]:
+    if isinstance(deck, (str, os.PathLike)):
+        with open(deck, encoding='utf-8', newline='') as csv_file:
+            # The first row is the header.
+            return list(csv.reader(csv_file))[1:]
+    return [tuple(row) for row in deck]
+
+
+def _card_db(cards: CardsSource, names=None):
+    if isinstance(cards, CardDeck):
+        return cards.getDb()
+    if isinstance(cards, Mapping):
+        return cards
+    return CardDeck(os.fspath(cards), names=names).getDb()
+
+
+def load_cards(cards: CardsSource, deck: Optional[DeckSource] = None) -> List[CardRecord]:
+    """Return one record per copy in ``deck``, or one per card in ``cards`` without a deck.
+
+    ``cards`` is a cards JSON path, a ``CardDeck`` or a mapping of card names
+    to definitions; ``deck`` is a deck CSV path or ``(quantity, name)`` rows.
+    """
+    if deck is None:
+        card_list = []
+        for entry in _card_db(cards).values():
+            card = CardModel()
+            card.load(entry)
+            card_list.append(card.compile())
+        return card_list
+
+    rows = _deck_rows(deck)
+    card_db = _card_db(cards, names={str(row[1]) for row in rows})
+    return LWCProto.expand_deck_rows(rows, card_db)
+
+
+def _convert(surface: cairo.ImageSurface, output: str, *, shared: bool, png_compression: Optional[int]):
+    if output == 'png':
+        return encode_png(surface, png_compression)
+    if output == 'array':
+        return surface_to_array(surface)
+    # Cached tiles are reused by later pages, so callers get their own copy.
+    return layout.copy_surface(surface) if shared else surface
+
+
+def render_deck(
+    cards: CardsSource,
+    deck: Optional[DeckSource] = None,
+    *,
+    single_card: bool = False,
+    output: str = 'surface',
+    images: bool = False,
+    rgb: Optional[Sequence[int]] = None,
+    layout_path: Optional[Union[str, os.PathLike]] = None,
+    output_root: Union[str, os.PathLike] = 'decks',
+    tile_store: Optional[TileStore] = None,
+    png_compression: Optional[int] = None,
+    dpi: Optional[float] = None,
+) -> Iterator[RenderedImage]:
+    """Yield the pages of ``deck``, or its cards one by one, as they are rendered.
+
+    ``output`` selects what ``RenderedImage.image`` holds: a cairo surface,
+    PNG bytes, or a NumPy RGB/RGBA array. Without a deck every card in
+    ``cards`` is rendered on its own. Nothing is written to disk apart from
+    resized art, which lives in the art store under ``output_root``.
+    ``dpi`` overrides the resolution, e.g. for quick low-resolution previews.
+    """
+    if output not in OUTPUT_FORMATS:
+        raise ValueError(f'output must be one of {", ".join(OUTPUT_FORMATS)}, got {output!r}')
+
+    card_list = load_cards(cards, deck)
+
+    render_options = dict(
+        deck_name='api',
+        output_root=pathlib.Path(output_root),
+        handle_images=images,
+        process_image_fn=None,
+        load_art_surface_fn=None,
+        load_full_frame_surface_fn=None,
+        tile_store=tile_store,
+    )
+    if images:
+        from add_images import load_art_surface, load_full_frame_surface, processImage
+
+        render_options.update(
+            process_image_fn=processImage,
+            load_art_surface_fn=load_art_surface,
+            load_full_frame_surface_fn=load_full_frame_surface,
+        )
+
+    if single_card or deck is None:
+        for index, card in enumerate(card_list):
+            tile = LWCProto.get_card_tile(card, dpi or layout.SINGLE_CARD_DPI, **render_options)
+            image = _convert(tile, output, shared=True, png_compression=png_compression)
+            yield RenderedImage(index, (card,), image)
+        return
+
+    for page_number, page in enumerate(LWCProto.chunk_cards(card_list)):
+        surface = LWCProto.compose_deck_page(
+            page,
+            modify_layout=rgb,
+            layout_path=os.fspath(layout_path) if layout_path is not None else None,
+            dpi=dpi,
+            **render_options,
+        )
+        image = _convert(surface, output, shared=False, png_compression=png_compression)
+        yield RenderedImage(page_number, tuple(page), image)
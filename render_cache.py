@@ -0,0 +1,196 @@
+import contextlib
+import hashlib
+import json
+import os
+import pathlib
+from typing import Dict, Iterable, Optional, Sequence, Union
+
+import cairo
+
+import fonts
+import layout
+from card_model import CardModel
+from utils import SOURCE_IMAGES_DIR, atomic_write, file_digest
+
+# Bump whenever a change to the drawing code alters the rendered pixels, so
+# tiles and outputs produced by older versions are not reused.
+CACHE_VERSION = 4
+
+# Disk budget shared by the persisted tiles and the resized art of an output root.
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+def _digest(payload) -> str:
+    encoded = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def render_fingerprint() -> str:
+    """Return a digest of the layout constants and the font selection.
+
+    It walks the layout module and hashes the font files, so callers compute
+    it once per run and pass it to ``card_digest``.
+    """
+    return _digest([
+        layout.constants_fingerprint(),
+        layout.FONT_FAMILY,
+        [file_digest(fonts.font_file_path(path)) for path in layout.FONT_FILES],
+    ])
+
+
+def card_digest(card: CardModel, dpi: float, *, handle_images: bool, fingerprint: Optional[str] = None) -> str:
+    """Return the content address of a rendered card tile.
+
+    ``fingerprint`` is the ``render_fingerprint()`` of the run.
+    """
+    if fingerprint is None:
+        fingerprint = render_fingerprint()
+
+    image_digest = None
+    if handle_images and card.image is not None:
+        image_digest = file_digest(SOURCE_IMAGES_DIR / str(card.image))
+
+    return _digest([
+        CACHE_VERSION,
+        'card',
+        fingerprint,
+        list(card.render_key()),
+        dpi,
+        handle_images,
+        image_digest,
+    ])
+
+
+def page_digest(
+    card_digests: Sequence[str],
+    *,
+    template_path: Union[pathlib.Path, str],
+    modify_layout: Optional[Sequence[int]],
+    png_compression: Optional[int] = None,
+) -> str:
+    """Return the content address of a page made of the given card tiles."""
+    return _digest([
+        CACHE_VERSION,
+        'page',
+        file_digest(template_path),
+        list(modify_layout) if modify_layout is not None else None,
+        list(card_digests),
+        png_compression,
+    ])
+
+
+def atlas_digest(
+    card_digests: Sequence[str],
+    *,
+    columns: int,
+    rows: int,
+    png_compression: Optional[int] = None,
+) -> str:
+    """Return the content address of an atlas sheet made of the given card tiles."""
+    return _digest([CACHE_VERSION, 'atlas', columns, rows, list(card_digests), png_compression])
+
+
+def card_output_digest(card_digest: str, *, png_compression: Optional[int] = None) -> str:
+    """Return the content address of a single-card PNG written from a tile."""
+    return _digest([CACHE_VERSION, 'card-output', card_digest, png_compression])
+
+
+class TileStore:
+    """Directory of rendered card tiles stored as PNG files named by digest.
+
+    ``fingerprint`` is the ``render_fingerprint()`` the tile digests use.
+    """
+
+    def __init__(self, directory: Union[pathlib.Path, str], fingerprint: Optional[str] = None):
+        self.directory = pathlib.Path(directory)
+        self.fingerprint = fingerprint if fingerprint is not None else render_fingerprint()
+
+    def path_for(self, digest: str) -> pathlib.Path:
+        return self.directory / digest[:2] / f'{digest}.png'
+
+    def load(self, digest: str) -> Optional[cairo.ImageSurface]:
+        path = self.path_for(digest)
+        if not path.exists():
+            return None
+
+        try:
+            return cairo.ImageSurface.create_from_png(str(path))
+        except (cairo.Error, OSError):
+            return None
+
+    def store(self, digest: str, surface: cairo.ImageSurface) -> None:
+        path = self.path_for(digest)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with atomic_write(path) as temporary:
+            surface.write_to_png(str(temporary))
+
+
+class OutputManifest:
+    """Record of the digest each generated output file was rendered from."""
+
+    def __init__(self, path: Union[pathlib.Path, str]):
+        self.path = pathlib.Path(path)
+        self._outputs: Dict[str, str] = {}
+
+        try:
+            with self.path.open(encoding='utf-8') as manifest_file:
+                self._outputs = json.load(manifest_file)
+        except (OSError, ValueError):
+            self._outputs = {}
+
+    def is_current(self, output_path: Union[pathlib.Path, str], digest: str) -> bool:
+        output_path = pathlib.Path(output_path)
+        return self._outputs.get(str(output_path)) == digest and output_path.exists()
+
+    def record(self, output_path: Union[pathlib.Path, str], digest: str) -> None:
+        self._outputs[str(pathlib.Path(output_path))] = digest
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with atomic_write(self.path) as temporary, temporary.open('w', encoding='utf-8') as manifest_file:
+            json.dump(self._outputs, manifest_file, indent=1, sort_keys=True)
+
+
+def prune_files(directories: Iterable[Union[pathlib.Path, str]], max_bytes: int) -> int:
+    """Delete the least recently used files under ``directories`` until they fit in ``max_bytes``.
+
+    Recency is the later of the access and modification times. Hidden files
+    are in-progress writes and are left alone. Returns the bytes removed.
+    """
+    entries = []
+    for directory in directories:
+        for root, _, names in os.walk(directory):
+            for name in names:
+                if name.startswith('.'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((max(stat.st_atime, stat.st_mtime), stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total - removed <= max_bytes:
+            break
+        with contextlib.suppress(OSError):
+            os.unlink(path)
+            removed += size
+    return removed
+
+
+class RenderCache:
+    """Persistent render cache stored under ``<output root>/.cache``.
+
+    Opening it trims the tiles and resized art to ``max_bytes``, dropping the
+    least recently used files first, so ``--watch`` and ``serve`` sessions
+    do not fill the disk with digests of old edits.
+    """
+
+    def __init__(self, output_root: Union[pathlib.Path, str], max_bytes: int = CACHE_MAX_BYTES):
+        self.directory = pathlib.Path(output_root) / '.cache'
+        prune_files([self.directory / 'tiles', self.directory / 'art'], max_bytes)
+        self.fingerprint = render_fingerprint()
+        self.tiles = TileStore(self.directory / 'tiles', self.fingerprint)
+        self.outputs = OutputManifest(self.directory / 'outputs.json')
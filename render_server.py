@@ -0,0 +1,326 @@
+import argparse
+import functools
+import json
+import os
+import pathlib
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import fonts
+import layout
+import LWCProto
+from card_model import CardModel, CardRecord
+from card_store import CardStore, open_card_store
+from png_writer import encode_png
+from render_cache import RenderCache
+from utils import SOURCE_IMAGES_DIR
+
+MIN_DPI = 10
+MAX_DPI = 1200
+
+# Query string spellings of the images flag.
+_QUERY_BOOLEANS = {'1': True, 'true': True, 'yes': True, '0': False, 'false': False, 'no': False}
+
+# Compiled card stores opened by this process, by cards file, with the
+# modification time and size they were opened for; least recently used first.
+MAX_OPEN_STORES = 8
+_STORES: 'OrderedDict[str, Tuple[Tuple[int, int], CardStore]]' = OrderedDict()
+
+
+class RenderRequestError(ValueError):
+    """A render request that cannot be served; carries the HTTP status."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+    def __reduce__(self):
+        # Raised in worker processes and pickled back to the server.
+        return (type(self), (self.status, str(self)))
+
+
+@functools.lru_cache(maxsize=None)
+def _render_cache(output_root: str) -> RenderCache:
+    return RenderCache(output_root)
+
+
+def _card_store(cards_file: str, cache_dir: pathlib.Path) -> CardStore:
+    path = pathlib.Path(cards_file)
+    try:
+        stat = path.stat()
+    except OSError:
+        raise RenderRequestError(404, f'cards file {cards_file} does not exist')
+
+    key = str(path.resolve())
+    version = (stat.st_mtime_ns, stat.st_size)
+    cached = _STORES.pop(key, None)
+    if cached is not None and cached[0] == version:
+        _STORES[key] = cached
+        return cached[1]
+
+    if cached is not None:
+        cached[1].close()
+    store = open_card_store(path, cache_dir)
+    _STORES[key] = (version, store)
+    while len(_STORES) > MAX_OPEN_STORES:
+        _, (_, evicted) = _STORES.popitem(last=False)
+        evicted.close()
+    return store
+
+
+def _check_image_name(card: CardRecord) -> None:
+    if card.image is None:
+        return
+
+    images_dir = SOURCE_IMAGES_DIR.resolve()
+    image_path = (images_dir / str(card.image)).resolve()
+    if images_dir not in image_path.parents:
+        raise RenderRequestError(400, f'image {card.image} is outside the images directory')
+
+
+def _request_card(request: dict, *, cards_file: Optional[str], cache_dir: pathlib.Path) -> CardRecord:
+    definition = request.get('card')
+    if definition is not None:
+        if not isinstance(definition, dict):
+            raise RenderRequestError(400, 'card must be a card definition object')
+        card = CardModel()
+        try:
+            card.load(definition)
+        except (KeyError, TypeError, ValueError) as error:
+            raise RenderRequestError(400, f'invalid card definition: {error!r}')
+        record = card.compile()
+        _check_image_name(record)
+        return record
+
+    name = request.get('name')
+    if not name:
+        raise RenderRequestError(400, 'either card or name is required')
+
+    if not cards_file:
+        raise RenderRequestError(400, 'the server has no cards file; send a card definition instead')
+    requested = request.get('cards')
+    if requested and pathlib.Path(str(requested)).resolve() != pathlib.Path(cards_file).resolve():
+        # Clients may only look cards up in the file the server was started with.
+        raise RenderRequestError(400, f'cards must be the server cards file {cards_file}')
+
+    store = _card_store(cards_file, cache_dir)
+    if name not in store:
+        raise RenderRequestError(404, f'card {name} is not in {cards_file}')
+    record = CardModel(name, store).compile()
+    _check_image_name(record)
+    return record
+
+
+def render_request(
+    request: dict,
+    *,
+    cards_file: Optional[str],
+    output_root: str,
+    handle_images: bool,
+) -> bytes:
+    """Render the card described by ``request`` and return it as PNG bytes.
+
+    Runs inside the server workers; fonts, the card stores, art and card
+    tiles stay cached in the worker between requests.
+    """
+    render_cache = _render_cache(output_root)
+    card = _request_card(request, cards_file=cards_file, cache_dir=render_cache.directory)
+
+    try:
+        dpi = int(request.get('dpi', layout.SINGLE_CARD_DPI))
+    except (TypeError, ValueError):
+        raise RenderRequestError(400, 'dpi must be an integer')
+    if not MIN_DPI <= dpi <= MAX_DPI:
+        raise RenderRequestError(400, f'dpi must be between {MIN_DPI} and {MAX_DPI}')
+
+    images = request.get('images', handle_images)
+    if not isinstance(images, bool):
+        raise RenderRequestError(400, 'images must be true or false')
+    process_image_fn = load_art_surface_fn = load_full_frame_surface_fn = None
+    if images:
+        from add_images import load_art_surface, load_full_frame_surface, processImage
+
+        process_image_fn = processImage
+        load_art_surface_fn = load_art_surface
+        load_full_frame_surface_fn = load_full_frame_surface
+
+    tile = LWCProto.get_card_tile(
+        card,
+        dpi,
+        deck_name='server',
+        output_root=pathlib.Path(output_root),
+        handle_images=images,
+        process_image_fn=process_image_fn,
+        load_art_surface_fn=load_art_surface_fn,
+        load_full_frame_surface_fn=load_full_frame_surface_fn,
+        # One-off definitions are not worth a permanent file in the tile store.
+        tile_store=None if 'card' in request else render_cache.tiles,
+    )
+    return encode_png(tile)
+
+
+def _warm_worker() -> None:
+    fonts.get_registry()
+    layout.get_template()
+
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    """``GET /card?name=...`` or ``POST /card`` with a JSON body; replies with PNG bytes."""
+
+    server: 'RenderServer'
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        if url.path == '/health':
+            self._send(200, 'text/plain', b'ok')
+            return
+        if url.path != '/card':
+            self._send_error(404, f'unknown path {url.path}')
+            return
+
+        request = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        if 'images' in request:
+            # Unknown spellings stay strings and are rejected by render_request.
+            request['images'] = _QUERY_BOOLEANS.get(request['images'].lower(), request['images'])
+        self._render(request)
+
+    def do_POST(self) -> None:
+        if urlsplit(self.path).path != '/card':
+            self._send_error(404, f'unknown path {self.path}')
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            self._send_error(400, 'Content-Length must be an integer')
+            return
+        if length < 0:
+            self._send_error(400, 'Content-Length cannot be negative')
+            return
+
+        try:
+            request = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError as error:
+            self._send_error(400, f'invalid JSON: {error}')
+            return
+        if not isinstance(request, dict):
+            self._send_error(400, 'the request body must be a JSON object')
+            return
+
+        self._render(request)
+
+    def _render(self, request: dict) -> None:
+        try:
+            png = self.server.render(request)
+        except RenderRequestError as error:
+            self._send_error(error.status, str(error))
+        except Exception as error:
+            self._send_error(500, f'{type(error).__name__}: {error}')
+        else:
+            self._send(200, 'image/png', png)
+
+    def _send(self, status: int, content_type: str, body: bytes) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: int, message: str) -> None:
+        self._send(status, 'application/json', json.dumps({'error': message}).encode('utf-8'))
+
+    def log_message(self, format: str, *args) -> None:
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+class RenderServer(ThreadingHTTPServer):
+    """HTTP server handing each render request to a pool of warm workers.
+
+    With a single job requests are rendered one at a time in this process;
+    otherwise they go to worker processes, each keeping its own caches.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        *,
+        cards_file: Optional[str] = None,
+        output_root: str = 'decks',
+        handle_images: bool = False,
+        jobs: int = 1,
+        quiet: bool = False,
+    ):
+        self.cards_file = cards_file
+        self.output_root = output_root
+        self.handle_images = handle_images
+        self.quiet = quiet
+
+        self.executor: Executor
+        if jobs <= 1:
+            _warm_worker()
+            self.executor = ThreadPoolExecutor(max_workers=1)
+        else:
+            self.executor = ProcessPoolExecutor(max_workers=jobs, initializer=_warm_worker)
+            # Start every worker now instead of from a request thread.
+            for future in [self.executor.submit(os.getpid) for _ in range(jobs)]:
+                future.result()
+
+        super().__init__(address, RenderRequestHandler)
+
+    def render(self, request: dict) -> bytes:
+        return self.executor.submit(
+            render_request,
+            request,
+            cards_file=self.cards_file,
+            output_root=self.output_root,
+            handle_images=self.handle_images,
+        ).result()
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.executor.shutdown()
+
+
+def parse_arguments(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog='LWCProto.py serve',
+        description='Serve rendered card PNGs over HTTP, keeping fonts, layout, art and tiles cached',
+    )
+    parser.add_argument('--host', help='Address to listen on', default='127.0.0.1')
+    parser.add_argument('--port', help='Port to listen on', type=int, default=8765)
+    parser.add_argument('-c', '--cards', help='json file used to look cards up by name; requests cannot name another one', type=LWCProto.extant_file, metavar='FILE')
+    parser.add_argument('-i', '--images', help='Add images to cards unless a request says otherwise', action='store_true')
+    parser.add_argument('-j', '--jobs', help='Number of worker processes rendering requests (0 uses every CPU)', type=LWCProto.job_count, default=1, metavar='N')
+    parser.add_argument('-o', '--output-dir', help='Directory holding the render cache and resized art', default='decks')
+
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_arguments(argv)
+
+    server = RenderServer(
+        (args.host, args.port),
+        cards_file=args.cards,
+        output_root=args.output_dir,
+        handle_images=args.images,
+        jobs=args.jobs,
+    )
+    host, port = server.server_address[:2]
+    print(f'Serving cards on http://{host}:{port}/card, press Ctrl+C to stop')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
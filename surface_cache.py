@@ -0,0 +1,129 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+import cairo
+
+
+def surface_nbytes(surface: cairo.ImageSurface) -> int:
+    """Return the size in bytes of the pixel buffer backing ``surface``."""
+    return surface.get_stride() * surface.get_height()
+
+
+class SurfaceCache:
+    """Least-recently-used cache of image surfaces bounded by their pixel bytes."""
+
+    def __init__(self, max_bytes: int = 512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries: 'OrderedDict[Hashable, cairo.ImageSurface]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable) -> Optional[cairo.ImageSurface]:
+        surface = self._entries.get(key)
+        if surface is not None:
+            self._entries.move_to_end(key)
+        return surface
+
+    def put(self, key: Hashable, surface: cairo.ImageSurface) -> None:
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.current_bytes -= surface_nbytes(previous)
+
+        self._entries[key] = surface
+        self.current_bytes += surface_nbytes(surface)
+
+        # Always keep the newest entry, even when it alone exceeds the budget.
+        while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self.current_bytes -= surface_nbytes(evicted)
+
+    def get_or_render(
+        self,
+        key: Hashable,
+        render: Callable[[], Optional[cairo.ImageSurface]],
+    ) -> Optional[cairo.ImageSurface]:
+        """Return the surface stored under ``key``, calling ``render`` on a miss.
+
+        A ``None`` result, e.g. for missing art, is returned without being cached.
+        """
+        surface = self.get(key)
+        if surface is None:
+            surface = render()
+            if surface is not None:
+                self.put(key, surface)
+        return surface
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.current_bytes = 0
+
+
+class SurfacePool:
+    """Reusable image surfaces, at most ``max_per_size`` per size and format.
+
+    ``acquire`` hands out a free surface of the requested size or allocates
+    one; once ``max_per_size`` of them are in use it blocks until another
+    thread (e.g. a PNG writer) calls ``release``. Long runs therefore reuse
+    the same few buffers instead of allocating one per page or card.
+    """
+
+    def __init__(self, max_per_size: int = 4):
+        self.max_per_size = max_per_size
+        self._free: Dict[Tuple[int, int, int], List[cairo.ImageSurface]] = {}
+        self._allocated: Dict[Tuple[int, int, int], int] = {}
+        self._in_use: Set[int] = set()
+        self._condition = threading.Condition()
+
+    def acquire(
+        self,
+        width: int,
+        height: int,
+        format: int = cairo.FORMAT_ARGB32,
+        *,
+        clear: bool = True,
+    ) -> cairo.ImageSurface:
+        """Return a surface of the given size; ``clear`` makes it fully transparent."""
+        key = (width, height, format)
+        with self._condition:
+            while not self._free.get(key) and self._allocated.get(key, 0) >= self.max_per_size:
+                self._condition.wait()
+
+            free = self._free.get(key)
+            if free:
+                surface = free.pop()
+            else:
+                # New surfaces are already zeroed.
+                surface = cairo.ImageSurface(format, width, height)
+                self._allocated[key] = self._allocated.get(key, 0) + 1
+                clear = False
+            self._in_use.add(id(surface))
+
+        if clear:
+            ctx = cairo.Context(surface)
+            ctx.set_operator(cairo.OPERATOR_CLEAR)
+            ctx.paint()
+        return surface
+
+    def release(self, surface: cairo.ImageSurface) -> None:
+        """Give back a surface returned by ``acquire``; the caller must not use it again."""
+        key = (surface.get_width(), surface.get_height(), surface.get_format())
+        with self._condition:
+            if id(surface) not in self._in_use:
+                return
+            self._in_use.discard(id(surface))
+            self._free.setdefault(key, []).append(surface)
+            self._condition.notify_all()
+
+    def clear(self) -> None:
+        """Drop the free surfaces; surfaces still in use are released as usual."""
+        with self._condition:
+            for key, free in self._free.items():
+                self._allocated[key] -= len(free)
+            self._free.clear()
+            self._condition.notify_all()
@@ -0,0 +1,105 @@
+import pytest
+
+try:
+    import cairo  # type: ignore
+    from PIL import Image
+
+    import add_images
+    import layout
+    from add_images import ArtStore, _image_to_surface
+except Exception:  # pragma: no cover - optional dependency missing
+    cairo = None
+
+
+@pytest.mark.skipif(cairo is None, reason="Image processing dependencies are unavailable")
+def test_opaque_image_becomes_rgb24_surface():
+    image = Image.new('RGB', (3, 2), (10, 20, 30))
+
+    surface = _image_to_surface(image)
+
+    assert surface.get_format() == cairo.FORMAT_RGB24
+    assert (surface.get_width(), surface.get_height()) == (3, 2)
+    assert tuple(layout.surface_pixels(surface)[1, 2][:3]) == (30, 20, 10)
+
+
+@pytest.mark.skipif(cairo is None, reason="Image processing dependencies are unavailable")
+def test_transparent_image_is_premultiplied():
+    image = Image.new('RGBA', (1, 1), (200, 100, 50, 128))
+
+    surface = _image_to_surface(image)
+
+    assert surface.get_format() == cairo.FORMAT_ARGB32
+    assert tuple(layout.surface_pixels(surface)[0, 0]) == (25, 50, 100, 128)
+
+
+@pytest.mark.skipif(cairo is None, reason="Image processing dependencies are unavailable")
+def test_art_store_resizes_each_source_and_size_once(tmp_path, monkeypatch):
+    source_dir = tmp_path / 'images'
+    source_dir.mkdir()
+    Image.new('RGB', (40, 20), (10, 20, 30)).save(source_dir / 'art.png')
+    monkeypatch.setattr(add_images, 'SOURCE_IMAGES_DIR', source_dir)
+
+    resizes = []
+    original = add_images._load_resized_source_image
+
+    def counting_resize(image_name, size_px):
+        resizes.append(size_px)
+        return original(image_name, size_px)
+
+    monkeypatch.setattr(add_images, '_load_resized_source_image', counting_resize)
+
+    store = ArtStore(tmp_path / 'art')
+    small = store.get('art.png', (4, 2))
+    assert store.get('art.png', (4, 2)) == small
+    assert ArtStore(tmp_path / 'art').get('art.png', (4, 2)) == small
+    large = store.get('art.png', (8, 4))
+
+    assert small != large
+    assert resizes == [(4, 2), (8, 4)]
+    with Image.open(large) as image:
+        assert image.size == (8, 4)
+    assert store.get('missing.png', (4, 2)) is None
+
+
+@pytest.mark.skipif(cairo is None, reason="Image processing dependencies are unavailable")
+def test_art_store_keeps_lossy_sources_as_png(tmp_path, monkeypatch):
+    source_dir = tmp_path / 'images'
+    source_dir.mkdir()
+    Image.new('RGB', (40, 20), (10, 20, 30)).save(source_dir / 'art.jpg')
+    monkeypatch.setattr(add_images, 'SOURCE_IMAGES_DIR', source_dir)
+
+    stored = ArtStore(tmp_path / 'art').get('art.jpg', (4, 2))
+
+    assert stored.suffix == '.png'
+    with Image.open(stored) as image:
+        assert image.format == 'PNG'
+
+
+@pytest.mark.skipif(cairo is None, reason="Image processing dependencies are unavailable")
+def test_full_frame_surfaces_are_opaque_and_cached(tmp_path, monkeypatch):
+    source_dir = tmp_path / 'images'
+    source_dir.mkdir()
+    Image.new('RGB', (40, 20), (10, 20, 30)).save(source_dir / 'frame.jpg')
+    monkeypatch.setattr(add_images, 'SOURCE_IMAGES_DIR', source_dir)
+    monkeypatch.setattr(add_images, '_FULL_FRAME_SURFACES', add_images.SurfaceCache(max_bytes=1 << 20))
+
+    surface = add_images._load_full_frame_surface_cached('frame.jpg', 30)
+
+    assert surface.get_format() == cairo.FORMAT_RGB24
+    assert add_images._load_full_frame_surface_cached('frame.jpg', 30) is surface
+    assert add_images._load_full_frame_surface_cached('missing.jpg', 30) is None
+
+
+@pytest.mark.skipif(cairo is None, reason="Image processing dependencies are unavailable")
+def test_load_art_surface_reuses_the_processed_path(tmp_path, monkeypatch):
+    art_path = tmp_path / 'art.png'
+    Image.new('RGB', (4, 2), (10, 20, 30)).save(art_path)
+
+    def unexpected_process(*args, **kwargs):
+        raise AssertionError('processImage should not run twice')
+
+    monkeypatch.setattr(add_images, 'processImage', unexpected_process)
+
+    surface = add_images.load_art_surface(None, 'deck', image_path=art_path)
+
+    assert (surface.get_width(), surface.get_height()) == (4, 2)
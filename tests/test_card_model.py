@@ -1,9 +1,10 @@
 import tempfile
 import json
 import pathlib
+import pickle
 import unittest
 
-from card_model import CardModel, CardDeck
+from card_model import CardModel, CardDeck, iter_card_entries
 
 
 class CardModelLoadTest(unittest.TestCase):
@@ -174,6 +175,64 @@ class CardModelLoadTest(unittest.TestCase):
         self.assertEqual(card.headerColour, "#000000")
         self.assertEqual(card.typeStr, "Enchantment")
 
+    def test_render_key_matches_for_identical_definitions(self):
+        data = {
+            "header": {
+                "text": "Copy",
+            },
+            "type": "Creature",
+            "commandPoints": "2/1",
+        }
+
+        first = CardModel()
+        first.load(data)
+        second = CardModel()
+        second.load(data)
+
+        self.assertEqual(first.render_key(), second.render_key())
+
+        second.cardText = "Different"
+        self.assertNotEqual(first.render_key(), second.render_key())
+
+
+class CardRecordTest(unittest.TestCase):
+    def _record(self):
+        card = CardModel()
+        card.load({
+            "header": {"text": "Compiled", "color": "#FF0000"},
+            "type": "Creature",
+            "subtype": "Elf",
+            "commandPoints": "2/5",
+            "background_color": "#00FF00",
+        })
+        return card, card.compile()
+
+    def test_record_resolves_values_once(self):
+        card, record = self._record()
+
+        self.assertEqual(record.headerText, "Compiled")
+        self.assertEqual(record.typeStr, "Creature - Elf")
+        self.assertEqual(record.get_header_text_color_rgb(), (1.0, 0.0, 0.0))
+        self.assertEqual(record.get_background_color_rgb(), (0.0, 1.0, 0.0))
+        self.assertEqual(record.get_command_points_display(), "2/5")
+        self.assertEqual(record.render_key(), card.render_key())
+        self.assertEqual(str(record), str(card))
+
+    def test_record_is_immutable_and_slotted(self):
+        _, record = self._record()
+
+        with self.assertRaises(AttributeError):
+            record.headerText = "Changed"
+        self.assertFalse(hasattr(record, "__dict__"))
+
+    def test_record_survives_pickling(self):
+        _, record = self._record()
+
+        restored = pickle.loads(pickle.dumps(record))
+
+        self.assertEqual(restored.render_key(), record.render_key())
+        self.assertEqual(restored.get_header_text_color_rgb(), record.get_header_text_color_rgb())
+
 
 class CardDeckLoadTest(unittest.TestCase):
     def test_load_uses_provided_path(self):
@@ -194,6 +253,39 @@ class CardDeckLoadTest(unittest.TestCase):
 
         self.assertIn("Example", deck.getDb())
 
+    def test_load_with_names_keeps_only_requested_cards(self):
+        cards = {
+            "Wanted": {"header": {"text": "Wanted"}, "type": "Artifact", "power": 12345},
+            "Skipped": {"header": {"text": "Skip } ] \" {"}, "type": ["nested", {"a": 1}]},
+            "Also wanted": {"name": "Legacy", "type": "Creature", "toughness": -2.5e10},
+        }
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            deck_path = pathlib.Path(tmp_dir) / "cards.json"
+            deck_path.write_text(json.dumps(cards, indent=2), encoding="utf-8")
+
+            deck = CardDeck(str(deck_path), names={"Wanted", "Also wanted"})
+
+        self.assertEqual(deck.getDb(), {
+            "Wanted": cards["Wanted"],
+            "Also wanted": cards["Also wanted"],
+        })
+
+    def test_streaming_handles_chunk_boundaries(self):
+        cards = {
+            "A \"quoted\" name": {"type": "x" * 40, "power": 1234567, "values": [1.5e-3, True, None]},
+            "B": {"type": "{[}]", "text": "ñandú"},
+            "C": [],
+        }
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            deck_path = pathlib.Path(tmp_dir) / "cards.json"
+            deck_path.write_text(json.dumps(cards, ensure_ascii=False), encoding="utf-8")
+
+            for chunk_size in (1, 2, 5, 64):
+                entries = dict(iter_card_entries(deck_path, {"A \"quoted\" name", "C"}, chunk_size=chunk_size))
+                self.assertEqual(entries, {"A \"quoted\" name": cards["A \"quoted\" name"], "C": []})
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,77 @@
+import json
+import os
+
+from card_model import CardDeck
+from card_store import CardStore, compile_cards, open_card_store
+
+
+CARDS = {
+    "Bolt": {
+        "header": {"text": "Lightning Bolt"},
+        "type": "Instant",
+        "card_text": {"text": "Deal 3 damage"},
+    },
+    "Goblin": {
+        "name": "Goblin Guide",
+        "type": "Creature",
+        "subtype": "Goblin",
+        "text": "Haste",
+    },
+}
+
+
+def _write_cards(path, cards):
+    path.write_text(json.dumps(cards), encoding="utf-8")
+
+
+def test_store_looks_up_cards_by_name(tmp_path):
+    cards_path = tmp_path / "cards.json"
+    _write_cards(cards_path, CARDS)
+
+    store = open_card_store(cards_path, tmp_path / "cache")
+
+    assert store["Goblin"] == CARDS["Goblin"]
+    assert "Bolt" in store and "Missing" not in store
+    assert list(store) == ["Bolt", "Goblin"]
+    assert len(store) == 2
+    assert store.values() == [CARDS["Bolt"], CARDS["Goblin"]]
+
+
+def test_store_search_by_name_type_and_text(tmp_path):
+    cards_path = tmp_path / "cards.json"
+    _write_cards(cards_path, CARDS)
+
+    store = open_card_store(cards_path, tmp_path / "cache")
+
+    assert store.search(name="lightning") == [("Bolt", "Lightning Bolt", "Instant")]
+    assert store.search(type_str="goblin") == [("Goblin", "Goblin Guide", "Creature - Goblin")]
+    assert store.search(text="damage") == [("Bolt", "Lightning Bolt", "Instant")]
+    assert store.search(limit=1) == [("Bolt", "Lightning Bolt", "Instant")]
+
+
+def test_store_is_rebuilt_only_when_the_source_changes(tmp_path):
+    cards_path = tmp_path / "cards.json"
+    store_path = tmp_path / "cards.sqlite"
+    _write_cards(cards_path, CARDS)
+
+    compile_cards(cards_path, store_path)
+    first_inode = store_path.stat().st_ino
+
+    # Touching the file without changing its contents keeps the compiled store.
+    stat = cards_path.stat()
+    os.utime(cards_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10_000_000))
+    compile_cards(cards_path, store_path)
+    assert store_path.stat().st_ino == first_inode
+
+    _write_cards(cards_path, {"Bolt": CARDS["Bolt"]})
+    compile_cards(cards_path, store_path)
+    assert list(CardStore(store_path)) == ["Bolt"]
+
+
+def test_card_deck_can_use_a_compiled_store(tmp_path):
+    cards_path = tmp_path / "cards.json"
+    _write_cards(cards_path, CARDS)
+
+    deck = CardDeck(str(cards_path), store_dir=tmp_path / "cache")
+
+    assert deck.getDb()["Bolt"] == CARDS["Bolt"]
@@ -1,12 +1,16 @@
+import argparse
+import os
+import pathlib
+import re
 import sys
 import pytest
 
-from utils import slugify
+from utils import atomic_write, slugify
 
 try:
-    from add_images import _ensure_output_dir
+    import LWCProto
 except Exception:  # pragma: no cover - optional dependency missing
-    _ensure_output_dir = None
+    LWCProto = None
 
 
 @pytest.mark.parametrize(
@@ -21,10 +25,209 @@ except Exception:  # pragma: no cover - optional dependency missing
 def test_slugify_generates_safe_names(value, expected):
     assert slugify(value) == expected
 
-@pytest.mark.skipif(_ensure_output_dir is None, reason="Image processing dependencies are unavailable")
-def test_ensure_output_dir_uses_custom_root(tmp_path):
-    output_dir = _ensure_output_dir('demo-deck', tmp_path)
-    expected_path = tmp_path / 'demo-deck' / 'images'
 
-    assert output_dir == expected_path
-    assert output_dir.exists()
+def test_atomic_write_replaces_on_success_and_cleans_up_on_failure(tmp_path):
+    target = tmp_path / 'out.txt'
+    with atomic_write(target) as temporary:
+        temporary.write_text('new')
+    assert target.read_text() == 'new'
+
+    with pytest.raises(RuntimeError):
+        with atomic_write(target) as temporary:
+            temporary.write_text('partial')
+            raise RuntimeError('write failed')
+
+    assert target.read_text() == 'new'
+    assert [path.name for path in tmp_path.iterdir()] == ['out.txt']
+
+@pytest.mark.skipif(LWCProto is None, reason="Rendering dependencies are unavailable")
+def test_job_count_zero_uses_every_cpu(monkeypatch):
+    monkeypatch.setattr(LWCProto.os, 'cpu_count', lambda: 6)
+
+    assert LWCProto.job_count('0') == 6
+    assert LWCProto.job_count('3') == 3
+
+
+@pytest.mark.skipif(LWCProto is None, reason="Rendering dependencies are unavailable")
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_run_jobs_preserves_task_order(jobs):
+    tasks = [3, -1, 4, -1, -5, 9, -2, 6]
+
+    assert list(LWCProto.run_jobs(abs, tasks, jobs)) == [abs(task) for task in tasks]
+
+
+def _worker_pid(_):
+    return os.getpid()
+
+
+@pytest.mark.skipif(LWCProto is None, reason="Rendering dependencies are unavailable")
+def test_shared_worker_pool_keeps_workers_between_runs():
+    with LWCProto.shared_worker_pool(2):
+        first = set(LWCProto.run_jobs(_worker_pid, range(8), 2))
+        second = set(LWCProto.run_jobs(_worker_pid, range(8), 2))
+
+    assert first & second
+    assert os.getpid() not in first | second
+    assert LWCProto._SHARED_POOL is None
+
+
+@pytest.mark.skipif(LWCProto is None, reason="Rendering dependencies are unavailable")
+def test_render_pdf_embeds_the_layout_once(tmp_path):
+    card = LWCProto.CardModel().compile()
+    output_path = tmp_path / 'deck.pdf'
+
+    LWCProto.render_pdf(
+        [card] * 10,
+        output_path=output_path,
+        deck_name='deck',
+        output_root=tmp_path,
+        handle_images=False,
+        single_card_mode=False,
+        modify_layout=None,
+        process_image_fn=None,
+        load_art_surface_fn=None,
+        load_full_frame_surface_fn=None,
+    )
+
+    pdf = output_path.read_bytes()
+    assert pdf.startswith(b'%PDF')
+    assert len(re.findall(rb'/Type\s*/Page\b', pdf)) == 2
+    assert pdf.count(b'/Subtype /Image') == 1
+
+
+@pytest.mark.skipif(LWCProto is None, reason="Rendering dependencies are unavailable")
+def test_expand_deck_files_expands_globs_in_order(tmp_path):
+    for name in ('b.csv', 'a.csv', 'c.csv'):
+        (tmp_path / name).write_text('Qty,Name\n')
+
+    deck_files = LWCProto.expand_deck_files([str(tmp_path / 'c.csv'), str(tmp_path / '*.csv')])
+
+    assert [pathlib.Path(deck_file).name for deck_file in deck_files] == ['c.csv', 'a.csv', 'b.csv']
+
+
+@pytest.mark.skipif(LWCProto is None, reason="Rendering dependencies are unavailable")
+def test_expand_deck_files_rejects_missing_and_colliding_decks(tmp_path):
+    (tmp_path / 'one').mkdir()
+    (tmp_path / 'two').mkdir()
+    (tmp_path / 'one' / 'deck.csv').write_text('Qty,Name\n')
+    (tmp_path / 'two' / 'deck.csv').write_text('Qty,Name\n')
+
+    with pytest.raises(argparse.ArgumentTypeError):
+        LWCProto.expand_deck_files([str(tmp_path / 'missing' / '*.csv')])
+    with pytest.raises(argparse.ArgumentTypeError):
+        LWCProto.expand_deck_files([str(tmp_path / '*' / 'deck.csv')])
+
+
+@pytest.mark.skipif(LWCProto is None, reason="Rendering dependencies are unavailable")
+def test_render_decks_draws_identical_pages_once(tmp_path, monkeypatch):
+    rendered = []
+
+    def fake_render_page(task, **options):
+        deck_name, deck_dir, page_number, page = task
+        rendered.append((deck_name, page_number))
+        output_path = LWCProto.deck_page_path(deck_dir, deck_name, page_number)
+        output_path.write_bytes(repr([card.headerText for card in page]).encode())
+        return output_path
+
+    monkeypatch.setattr(LWCProto, '_render_deck_page', fake_render_page)
+    monkeypatch.setattr(LWCProto.layout, 'get_surface_dpi', lambda template: 100)
+    monkeypatch.setattr(LWCProto.layout, 'get_template', lambda *args: None)
+
+    basic = LWCProto.CardModel().compile()
+    other = LWCProto.CardModel()
+    other.headerText = 'Other'
+    other = other.compile()
+
+    first = LWCProto.DeckJob('first', tmp_path, [basic] * 18 + [other])
+    second = LWCProto.DeckJob('second', tmp_path, [basic] * 9)
+    LWCProto.render_decks(
+        [first, second],
+        output_root=tmp_path,
+        handle_images=False,
+        modify_layout=None,
+        process_image_fn=None,
+        load_art_surface_fn=None,
+        load_full_frame_surface_fn=None,
+    )
+
+    assert rendered == [('first', 0), ('first', 2)]
+    page = LWCProto.deck_page_path(tmp_path, 'first', 0).read_bytes()
+    assert LWCProto.deck_page_path(tmp_path, 'first', 1).read_bytes() == page
+    assert LWCProto.deck_page_path(tmp_path, 'second', 0).read_bytes() == page
+
+
+@pytest.mark.skipif(LWCProto is None, reason="Rendering dependencies are unavailable")
+def test_atlas_grid_parses_columns_and_rows():
+    assert LWCProto.atlas_grid('10x7') == (10, 7)
+
+    for value in ('10', 'x7', '0x3', 'axb'):
+        with pytest.raises(argparse.ArgumentTypeError):
+            LWCProto.atlas_grid(value)
+
+
+@pytest.mark.skipif(LWCProto is None, reason="Rendering dependencies are unavailable")
+def test_render_atlas_draws_unique_cards_once_and_indexes_every_entry(tmp_path):
+    import json
+
+    basic = LWCProto.CardModel().compile()
+    other = LWCProto.CardModel()
+    other.headerText = 'Other'
+    other = other.compile()
+
+    index_path = LWCProto.render_atlas(
+        [basic, other, basic, other, basic],
+        deck_name='deck',
+        deck_dir=tmp_path,
+        columns=1,
+        rows=1,
+        dpi=20,
+        entry_names=['a', 'b', 'a', 'b', 'a'],
+        output_root=tmp_path,
+        handle_images=False,
+        process_image_fn=None,
+        load_art_surface_fn=None,
+        load_full_frame_surface_fn=None,
+    )
+
+    index = json.loads(index_path.read_text(encoding='utf-8'))
+    assert index['sheets'] == ['deck_atlas0.png', 'deck_atlas1.png']
+    assert [entry['sheet'] for entry in index['entries']] == [0, 1, 0, 1, 0]
+    assert [entry['name'] for entry in index['entries']] == ['a', 'b', 'a', 'b', 'a']
+    assert (tmp_path / 'deck_atlas1.png').exists()
+
+
+@pytest.mark.skipif(LWCProto is None, reason="Rendering dependencies are unavailable")
+def test_preview_pages_draw_tiles_at_the_requested_dpi(monkeypatch):
+    dpis = []
+
+    def fake_tile(card, dpi, **options):
+        dpis.append(dpi)
+        return LWCProto.cairo.ImageSurface(LWCProto.cairo.FORMAT_ARGB32, 2, 2)
+
+    monkeypatch.setattr(LWCProto, 'get_card_tile', fake_tile)
+
+    page = LWCProto.compose_deck_page(
+        [LWCProto.CardModel().compile()],
+        deck_name='deck',
+        output_root=pathlib.Path('decks'),
+        handle_images=False,
+        modify_layout=None,
+        process_image_fn=None,
+        load_art_surface_fn=None,
+        load_full_frame_surface_fn=None,
+        dpi=75,
+    )
+
+    assert dpis == [75]
+    assert page.get_width() == 638
+
+
+@pytest.mark.skipif(LWCProto is None, reason="pycairo is not available")
+def test_browse_rejects_a_missing_cards_file(tmp_path, capsys):
+    import browse_model
+
+    with pytest.raises(SystemExit) as excinfo:
+        browse_model.parse_arguments(['-c', str(tmp_path / 'missing.json')])
+
+    assert excinfo.value.code == 2
+    assert 'does not exist' in capsys.readouterr().err
@@ -0,0 +1,46 @@
+import os
+
+from file_watch import changed_paths, snapshot, watch
+
+
+def test_snapshot_expands_directories_and_skips_missing_files(tmp_path):
+    images = tmp_path / 'images'
+    images.mkdir()
+    (images / 'a.png').write_bytes(b'a')
+    cards = tmp_path / 'cards.json'
+    cards.write_text('{}')
+
+    state = snapshot([cards, images, tmp_path / 'missing.csv'])
+
+    assert set(state) == {str(cards), str(images / 'a.png')}
+
+
+def test_changed_paths_reports_added_removed_and_modified_files():
+    before = {'a': (1, 1), 'b': (1, 1), 'c': (1, 1)}
+    after = {'a': (1, 1), 'b': (2, 1), 'd': (1, 1)}
+
+    assert changed_paths(before, after) == ['b', 'c', 'd']
+
+
+def test_watch_reports_each_change_once(tmp_path):
+    cards = tmp_path / 'cards.json'
+    cards.write_text('{}')
+    polls = []
+    reported = []
+
+    def list_paths():
+        polls.append(None)
+        if len(polls) == 2:
+            cards.write_text('{"Carta1": {}}')
+            os.utime(cards, ns=(1, 1))
+        return [cards]
+
+    watch(
+        list_paths,
+        reported.append,
+        interval=0,
+        settle=0,
+        should_stop=lambda: len(polls) >= 6,
+    )
+
+    assert reported == [[str(cards)]]
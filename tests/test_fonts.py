@@ -0,0 +1,50 @@
+import pytest
+
+try:
+    import cairo  # type: ignore
+except Exception:  # pragma: no cover - optional dependency missing
+    cairo = None
+
+if cairo is not None:  # pragma: no branch - conditional import for optional dependency
+    import fonts
+else:  # pragma: no cover - only triggered when cairo is missing
+    fonts = None
+
+
+@pytest.mark.skipif(cairo is None, reason="pycairo is not available")
+def test_scaled_fonts_are_reused_across_translations():
+    registry = fonts.FontRegistry()
+    card_matrix = cairo.Matrix(xx=11.8, yy=11.8)
+    moved_matrix = cairo.Matrix(xx=11.8, yy=11.8, x0=250.0, y0=400.0)
+
+    first = registry.scaled_font(fonts.BOLD, 3.6, card_matrix)
+
+    assert registry.scaled_font(fonts.BOLD, 3.6, moved_matrix) is first
+    assert registry.scaled_font(fonts.REGULAR, 3.6, card_matrix) is not first
+    assert registry.scaled_font(fonts.BOLD, 2.0, card_matrix) is not first
+
+
+@pytest.mark.skipif(cairo is None, reason="pycairo is not available")
+def test_use_selects_the_registry_face():
+    registry = fonts.FontRegistry()
+    ctx = cairo.Context(cairo.ImageSurface(cairo.FORMAT_ARGB32, 10, 10))
+
+    registry.use(ctx, fonts.ITALIC, 2.5)
+
+    face = ctx.get_font_face()
+    assert face.get_slant() == cairo.FONT_SLANT_ITALIC
+    assert ctx.get_font_matrix().xx == pytest.approx(2.5)
+
+
+@pytest.mark.skipif(cairo is None, reason="pycairo is not available")
+def test_font_files_must_contain_the_font_family():
+    try:
+        serif = fonts.matched_font_file('serif', fonts.REGULAR)
+        monospace = fonts.matched_font_file('monospace', fonts.REGULAR)
+    except RuntimeError:
+        pytest.skip('fontconfig is not available')
+    if serif is None or serif == monospace:
+        pytest.skip('needs distinct serif and monospace system fonts')
+
+    with pytest.raises(RuntimeError, match='FONT_FILES'):
+        fonts.FontRegistry('monospace', [serif])
@@ -0,0 +1,65 @@
+import pytest
+
+try:
+    import cairo  # type: ignore
+except Exception:  # pragma: no cover - optional dependency missing
+    cairo = None
+
+if cairo is not None:  # pragma: no branch - conditional import for optional dependency
+    import layout
+else:  # pragma: no cover - only triggered when cairo is missing
+    layout = None
+
+
+@pytest.mark.skipif(cairo is None, reason="pycairo is not available")
+def test_recolour_frame_only_changes_opaque_frame_greys():
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, 4, 1)
+    pixels = layout.surface_pixels(surface)
+    pixels[0, 0] = (200, 200, 200, 255)  # frame grey
+    pixels[0, 1] = (100, 100, 100, 255)  # darker than the frame
+    pixels[0, 2] = (200, 210, 200, 255)  # not a grey
+    pixels[0, 3] = (252, 252, 252, 255)  # lightest frame grey
+    surface.mark_dirty()
+
+    layout.recolour_frame(surface, (10, 20, 30))
+
+    pixels = layout.surface_pixels(surface)
+    assert tuple(pixels[0, 0]) == (30, 20, 10, 255)
+    assert tuple(pixels[0, 1]) == (100, 100, 100, 255)
+    assert tuple(pixels[0, 2]) == (200, 210, 200, 255)
+    assert tuple(pixels[0, 3]) == (30, 20, 10, 255)
+
+
+@pytest.mark.skipif(cairo is None, reason="pycairo is not available")
+def test_constants_fingerprint_tracks_layout_constants(monkeypatch):
+    fingerprint = layout.constants_fingerprint()
+
+    monkeypatch.setattr(layout, 'CARD_CORNER_RADIUS_MM', layout.CARD_CORNER_RADIUS_MM + 1)
+
+    assert layout.constants_fingerprint() != fingerprint
+
+
+@pytest.mark.skipif(cairo is None, reason="pycairo is not available")
+def test_get_surface_copies_the_cached_template():
+    template = layout.get_template()
+    first = layout.getSurface()
+    second = layout.getSurface()
+
+    assert layout.get_template() is template
+    assert first is not template and first is not second
+    assert (first.get_width(), first.get_height()) == (template.get_width(), template.get_height())
+
+    layout.surface_pixels(first)[0, 0] = (1, 2, 3, 255)
+    first.mark_dirty()
+
+    assert tuple(layout.surface_pixels(second)[0, 0]) == tuple(layout.surface_pixels(template)[0, 0])
+
+
+@pytest.mark.skipif(cairo is None, reason="pycairo is not available")
+def test_get_template_resamples_to_the_requested_dpi():
+    template = layout.get_template()
+    preview = layout.get_template(dpi=75)
+
+    assert (preview.get_width(), preview.get_height()) == (638, 825)
+    assert layout.get_template(dpi=75) is preview
+    assert layout.get_template(dpi=layout.get_surface_dpi(template)) is template
@@ -0,0 +1,90 @@
+import os
+
+import pytest
+
+try:
+    import cairo  # type: ignore
+except Exception:  # pragma: no cover - optional dependency missing
+    cairo = None
+
+if cairo is not None:  # pragma: no branch - conditional import for optional dependency
+    from PIL import Image
+
+    import layout
+    from png_writer import PngWriter, surface_to_image, write_png
+else:  # pragma: no cover - only triggered when cairo is missing
+    PngWriter = surface_to_image = write_png = None
+
+
+def _half_transparent_red():
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, 4, 3)
+    pixels = layout.surface_pixels(surface)
+    pixels[...] = (0, 0, 128, 128)  # premultiplied BGRA
+    surface.mark_dirty()
+    return surface
+
+
+@pytest.mark.skipif(cairo is None, reason="pycairo is not available")
+def test_surface_to_image_unpremultiplies_alpha():
+    image = surface_to_image(_half_transparent_red())
+
+    assert image.mode == 'RGBA'
+    assert image.size == (4, 3)
+    assert image.getpixel((0, 0)) == (255, 0, 0, 128)
+
+
+@pytest.mark.skipif(cairo is None, reason="pycairo is not available")
+def test_write_png_with_compression_level(tmp_path):
+    path = tmp_path / 'out.png'
+
+    write_png(_half_transparent_red(), path, compression=0)
+
+    with Image.open(path) as image:
+        assert image.getpixel((3, 2)) == (255, 0, 0, 128)
+
+
+@pytest.mark.skipif(cairo is None, reason="pycairo is not available")
+def test_png_writer_writes_every_submitted_surface(tmp_path):
+    paths = [tmp_path / f'{index}.png' for index in range(5)]
+
+    with PngWriter(max_pending=1) as writer:
+        for path in paths:
+            writer.submit(_half_transparent_red(), path)
+
+    assert all(path.exists() for path in paths)
+
+
+@pytest.mark.skipif(cairo is None, reason="pycairo is not available")
+def test_png_writer_releases_surfaces_after_writing(tmp_path):
+    surface = _half_transparent_red()
+    released = []
+
+    writer = PngWriter()
+    writer.submit(surface, tmp_path / 'out.png', released.append)
+    writer.submit(surface, tmp_path / 'missing' / 'out.png', released.append)
+    with pytest.raises(Exception):
+        writer.close()
+
+    assert released == [surface, surface]
+
+
+@pytest.mark.skipif(cairo is None, reason="pycairo is not available")
+def test_png_writer_reraises_write_errors(tmp_path):
+    writer = PngWriter()
+    writer.submit(_half_transparent_red(), tmp_path / 'missing' / 'out.png')
+
+    with pytest.raises(Exception):
+        writer.close()
+
+
+@pytest.mark.skipif(cairo is None, reason="pycairo is not available")
+def test_write_png_does_not_write_through_hard_links(tmp_path):
+    original = tmp_path / 'p0.png'
+    duplicate = tmp_path / 'p1.png'
+    original.write_bytes(b'page')
+    os.link(original, duplicate)
+
+    write_png(_half_transparent_red(), original)
+
+    assert duplicate.read_bytes() == b'page'
+    assert original.read_bytes().startswith(b'\x89PNG')
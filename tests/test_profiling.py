@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+import profiling
+
+
+@pytest.fixture(autouse=True)
+def _profiling_off():
+    profiling.disable()
+    yield
+    profiling.disable()
+
+
+def test_spans_are_ignored_while_disabled():
+    with profiling.span('card', 'card', card='A'):
+        pass
+
+    assert profiling.take_events() == []
+
+
+def test_spans_become_complete_trace_events(tmp_path):
+    profiling.enable()
+    with profiling.span('card', 'card', card='A'):
+        with profiling.span('drawCard', 'draw'):
+            pass
+
+    events = profiling.take_events()
+    assert [event['name'] for event in events] == ['drawCard', 'card']
+    assert all(event['ph'] == 'X' and event['dur'] >= 0 for event in events)
+    assert events[1]['args'] == {'card': 'A'}
+
+    trace_path = tmp_path / 'trace.json'
+    profiling.write_trace(trace_path, events)
+    assert json.loads(trace_path.read_text())['traceEvents'] == events
+
+
+def test_call_collecting_returns_worker_events():
+    def worker(value):
+        with profiling.span('page', 'page', page=value):
+            return value * 2
+
+    result, events = profiling.call_collecting(worker, 21)
+
+    assert result == 42
+    assert [event['args'] for event in events] == [{'page': 21}]
+    assert not profiling.is_enabled()
+
+
+def test_summary_lists_totals_and_slowest_cards():
+    events = [
+        {'name': 'card', 'dur': 3000.0, 'args': {'card': 'slow'}},
+        {'name': 'card', 'dur': 1000.0, 'args': {'card': 'fast'}},
+        {'name': 'encode', 'dur': 500.0, 'args': {}},
+    ]
+
+    lines = profiling.summary(events, slowest=1).splitlines()
+
+    assert lines[1].split() == ['card', '2', '4.0', '2.00']
+    assert lines[2].split() == ['encode', '1', '0.5', '0.50']
+    assert lines[-1].split() == ['slow', '3.0']
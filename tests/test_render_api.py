@@ -0,0 +1,52 @@
+import pytest
+
+try:
+    import cairo  # type: ignore
+
+    import render_api
+except Exception:  # pragma: no cover - optional dependency missing
+    cairo = render_api = None
+
+CARDS = {
+    'Carta1': {'type': 'Evento', 'header': {'text': 'Uno'}},
+    'Carta2': {'type': 'Unidad', 'header': {'text': 'Dos'}},
+}
+
+
+@pytest.mark.skipif(render_api is None, reason="Rendering dependencies are unavailable")
+def test_load_cards_expands_rows_and_shares_records():
+    card_list = render_api.load_cards(CARDS, [(2, 'Carta1'), ('1', 'Carta2')])
+
+    assert [card.headerText for card in card_list] == ['Uno', 'Uno', 'Dos']
+    assert card_list[0] is card_list[1]
+    assert len(render_api.load_cards(CARDS)) == 2
+
+
+@pytest.mark.skipif(render_api is None, reason="Rendering dependencies are unavailable")
+def test_render_deck_yields_pages_in_every_format(tmp_path):
+    deck = tmp_path / 'deck.csv'
+    deck.write_text('Qty,Name\n10,Carta1\n')
+
+    surfaces = list(render_api.render_deck(CARDS, deck))
+    assert [(page.index, len(page.cards)) for page in surfaces] == [(0, 9), (1, 1)]
+    assert isinstance(surfaces[0].image, cairo.ImageSurface)
+
+    png = next(render_api.render_deck(CARDS, deck, output='png'))
+    assert png.image.startswith(b'\x89PNG')
+
+    array = next(render_api.render_deck(CARDS, deck, output='array'))
+    assert array.image.shape[:2] == (surfaces[0].image.get_height(), surfaces[0].image.get_width())
+
+
+@pytest.mark.skipif(render_api is None, reason="Rendering dependencies are unavailable")
+def test_single_cards_are_independent_copies_of_cached_tiles():
+    first, second = render_api.render_deck(CARDS, [(2, 'Carta1')], single_card=True)
+
+    assert first.image is not second.image
+    assert first.cards == second.cards
+
+
+@pytest.mark.skipif(render_api is None, reason="Rendering dependencies are unavailable")
+def test_render_deck_rejects_unknown_output():
+    with pytest.raises(ValueError):
+        next(render_api.render_deck(CARDS, output='gif'))
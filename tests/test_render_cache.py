@@ -0,0 +1,98 @@
+import pytest
+
+try:
+    import cairo  # type: ignore
+except Exception:  # pragma: no cover - optional dependency missing
+    cairo = None
+
+from card_model import CardModel
+
+if cairo is not None:  # pragma: no branch - conditional import for optional dependency
+    import render_cache
+else:  # pragma: no cover - only triggered when cairo is missing
+    render_cache = None
+
+
+def _card(text):
+    card = CardModel()
+    card.load({'header': {'text': 'Cached'}, 'type': 'Evento', 'card_text': {'text': text}})
+    return card
+
+
+@pytest.mark.skipif(cairo is None, reason="pycairo is not available")
+def test_card_digest_depends_on_content_and_dpi():
+    digest = render_cache.card_digest(_card('one'), 300, handle_images=False)
+
+    assert digest == render_cache.card_digest(_card('one'), 300, handle_images=False)
+    assert digest != render_cache.card_digest(_card('two'), 300, handle_images=False)
+    assert digest != render_cache.card_digest(_card('one'), 150, handle_images=False)
+
+
+@pytest.mark.skipif(cairo is None, reason="pycairo is not available")
+def test_card_digest_depends_on_the_font_selection(monkeypatch):
+    digest = render_cache.card_digest(_card('one'), 300, handle_images=False)
+
+    monkeypatch.setattr(render_cache.layout, 'FONT_FAMILY', 'Other Family')
+
+    assert render_cache.card_digest(_card('one'), 300, handle_images=False) != digest
+    fingerprint = render_cache.render_fingerprint()
+    assert render_cache.card_digest(_card('one'), 300, handle_images=False, fingerprint=fingerprint) != digest
+
+
+@pytest.mark.skipif(cairo is None, reason="pycairo is not available")
+def test_output_digests_depend_on_png_compression():
+    options = dict(template_path='layout.png', modify_layout=None)
+
+    assert render_cache.page_digest(['a'], **options) != render_cache.page_digest(['a'], png_compression=1, **options)
+    assert render_cache.atlas_digest(['a'], columns=1, rows=1) != render_cache.atlas_digest(
+        ['a'], columns=1, rows=1, png_compression=1
+    )
+    assert render_cache.card_output_digest('a') != render_cache.card_output_digest('a', png_compression=9)
+
+
+@pytest.mark.skipif(cairo is None, reason="pycairo is not available")
+def test_file_digest_tracks_file_contents(tmp_path):
+    source = tmp_path / 'art.png'
+    source.write_bytes(b'first')
+    first = render_cache.file_digest(source)
+
+    source.write_bytes(b'second version')
+
+    assert render_cache.file_digest(source) != first
+    assert render_cache.file_digest(tmp_path / 'missing.png') is None
+
+
+@pytest.mark.skipif(cairo is None, reason="pycairo is not available")
+def test_output_manifest_round_trip(tmp_path):
+    output = tmp_path / 'deck_p0.png'
+    manifest = render_cache.OutputManifest(tmp_path / 'outputs.json')
+    manifest.record(output, 'abc')
+    manifest.save()
+
+    reloaded = render_cache.OutputManifest(tmp_path / 'outputs.json')
+    assert not reloaded.is_current(output, 'abc')
+
+    output.write_bytes(b'png')
+    assert reloaded.is_current(output, 'abc')
+    assert not reloaded.is_current(output, 'def')
+
+
+@pytest.mark.skipif(cairo is None, reason="pycairo is not available")
+def test_render_cache_prunes_least_recently_used_files(tmp_path):
+    import os
+
+    tiles = tmp_path / '.cache' / 'tiles' / 'ab'
+    art = tmp_path / '.cache' / 'art'
+    tiles.mkdir(parents=True)
+    art.mkdir(parents=True)
+    for age, path in enumerate([tiles / 'new.png', art / 'middle.png', tiles / 'old.png']):
+        path.write_bytes(b'x' * 10)
+        os.utime(path, (1000 - age * 100, 1000 - age * 100))
+    (art / '.partial.tmp').write_bytes(b'x' * 10)
+
+    render_cache.RenderCache(tmp_path, max_bytes=25)
+
+    assert (tiles / 'new.png').exists()
+    assert (art / 'middle.png').exists()
+    assert not (tiles / 'old.png').exists()
+    assert (art / '.partial.tmp').exists()
@@ -0,0 +1,120 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+try:
+    import render_server
+except Exception:  # pragma: no cover - optional dependency missing
+    render_server = None
+
+
+@pytest.fixture
+def server_url(tmp_path):
+    cards_file = tmp_path / 'cards.json'
+    cards_file.write_text(json.dumps({'Carta1': {'type': 'Evento', 'header': {'text': 'Uno'}}}))
+
+    server = render_server.RenderServer(
+        ('127.0.0.1', 0),
+        cards_file=str(cards_file),
+        output_root=str(tmp_path / 'out'),
+        quiet=True,
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://127.0.0.1:{server.server_address[1]}'
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.mark.skipif(render_server is None, reason="Rendering dependencies are unavailable")
+def test_server_renders_cards_by_name_and_definition(server_url):
+    with urllib.request.urlopen(f'{server_url}/card?name=Carta1&dpi=50') as response:
+        assert response.headers['Content-Type'] == 'image/png'
+        assert response.read().startswith(b'\x89PNG')
+
+    body = json.dumps({'card': {'type': 'Unidad', 'header': {'text': 'Inline'}}, 'dpi': 50}).encode('utf-8')
+    with urllib.request.urlopen(urllib.request.Request(f'{server_url}/card', data=body)) as response:
+        assert response.read().startswith(b'\x89PNG')
+
+
+@pytest.mark.skipif(render_server is None, reason="Rendering dependencies are unavailable")
+def test_server_reports_unknown_cards(server_url):
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(f'{server_url}/card?name=Missing')
+
+    assert error.value.code == 404
+    assert 'Missing' in json.loads(error.value.read())['error']
+
+
+@pytest.mark.skipif(render_server is None, reason="Rendering dependencies are unavailable")
+@pytest.mark.parametrize("body", [
+    {'name': 'Carta1', 'images': 'false'},
+    {'card': {'type': 'Evento', 'header': {'text': 'Uno'}, 'image': '../cartas.json'}},
+    {'name': 'Carta1', 'cards': 'cartas.json'},
+])
+def test_server_rejects_invalid_requests(server_url, body):
+    request = urllib.request.Request(f'{server_url}/card', data=json.dumps(body).encode('utf-8'))
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(request)
+
+    assert error.value.code == 400
+
+
+@pytest.mark.skipif(render_server is None, reason="Rendering dependencies are unavailable")
+def test_server_rejects_a_non_numeric_content_length(server_url):
+    import http.client
+    from urllib.parse import urlsplit
+
+    url = urlsplit(server_url)
+    connection = http.client.HTTPConnection(url.hostname, url.port)
+    try:
+        connection.putrequest('POST', '/card')
+        connection.putheader('Content-Length', 'abc')
+        connection.endheaders()
+        response = connection.getresponse()
+
+        assert response.status == 400
+        assert 'Content-Length' in json.loads(response.read())['error']
+    finally:
+        connection.close()
+
+
+@pytest.mark.skipif(render_server is None, reason="Rendering dependencies are unavailable")
+def test_inline_cards_are_not_written_to_the_tile_store(tmp_path, monkeypatch):
+    tile_stores = []
+    get_card_tile = render_server.LWCProto.get_card_tile
+
+    def recording_get_card_tile(*args, tile_store=None, **kwargs):
+        tile_stores.append(tile_store)
+        return get_card_tile(*args, tile_store=tile_store, **kwargs)
+
+    monkeypatch.setattr(render_server.LWCProto, 'get_card_tile', recording_get_card_tile)
+
+    render_server.render_request(
+        {'card': {'type': 'Evento', 'header': {'text': 'Inline'}}, 'dpi': 20},
+        cards_file=None,
+        output_root=str(tmp_path / 'out'),
+        handle_images=False,
+    )
+
+    assert tile_stores == [None]
+
+
+@pytest.mark.skipif(render_server is None, reason="Rendering dependencies are unavailable")
+def test_card_stores_are_closed_when_evicted(tmp_path, monkeypatch):
+    monkeypatch.setattr(render_server, 'MAX_OPEN_STORES', 1)
+    monkeypatch.setattr(render_server, '_STORES', render_server.OrderedDict())
+    stores = []
+    for name in ('first', 'second'):
+        cards_file = tmp_path / f'{name}.json'
+        cards_file.write_text(json.dumps({'Carta1': {'type': 'Evento'}}))
+        stores.append(render_server._card_store(str(cards_file), tmp_path / 'cache'))
+
+    assert list(render_server._STORES.values())[0][1] is stores[1]
+    with pytest.raises(Exception):
+        len(stores[0])
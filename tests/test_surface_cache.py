@@ -0,0 +1,85 @@
+import pytest
+
+try:
+    import cairo  # type: ignore
+except Exception:  # pragma: no cover - optional dependency missing
+    cairo = None
+
+if cairo is not None:  # pragma: no branch - conditional import for optional dependency
+    from surface_cache import SurfaceCache, SurfacePool, surface_nbytes
+else:  # pragma: no cover - only triggered when cairo is missing
+    SurfaceCache = SurfacePool = surface_nbytes = None
+
+
+def _surface():
+    return cairo.ImageSurface(cairo.FORMAT_ARGB32, 10, 10)
+
+
+@pytest.mark.skipif(cairo is None, reason="pycairo is not available")
+def test_get_or_render_renders_each_key_once():
+    cache = SurfaceCache()
+    calls = []
+
+    def render():
+        calls.append(1)
+        return _surface()
+
+    first = cache.get_or_render('card', render)
+    second = cache.get_or_render('card', render)
+
+    assert first is second
+    assert len(calls) == 1
+
+
+@pytest.mark.skipif(cairo is None, reason="pycairo is not available")
+def test_get_or_render_does_not_cache_missing_surfaces():
+    cache = SurfaceCache()
+
+    assert cache.get_or_render('missing', lambda: None) is None
+    assert 'missing' not in cache
+
+
+@pytest.mark.skipif(cairo is None, reason="pycairo is not available")
+def test_cache_evicts_least_recently_used_entries_by_bytes():
+    entry_bytes = surface_nbytes(_surface())
+    cache = SurfaceCache(max_bytes=entry_bytes * 2)
+
+    cache.put('a', _surface())
+    cache.put('b', _surface())
+    cache.get('a')
+    cache.put('c', _surface())
+
+    assert 'a' in cache
+    assert 'b' not in cache
+    assert 'c' in cache
+    assert cache.current_bytes == entry_bytes * 2
+
+
+@pytest.mark.skipif(cairo is None, reason="pycairo is not available")
+def test_pool_reuses_released_surfaces_per_size():
+    pool = SurfacePool()
+
+    first = pool.acquire(10, 10)
+    pool.release(first)
+
+    assert pool.acquire(10, 10) is first
+    assert pool.acquire(10, 10) is not first
+    assert pool.acquire(20, 10).get_width() == 20
+
+
+@pytest.mark.skipif(cairo is None, reason="pycairo is not available")
+def test_pool_blocks_until_a_surface_is_released():
+    import threading
+
+    pool = SurfacePool(max_per_size=1)
+    first = pool.acquire(10, 10)
+    acquired = []
+
+    waiter = threading.Thread(target=lambda: acquired.append(pool.acquire(10, 10)))
+    waiter.start()
+    waiter.join(0.05)
+    assert acquired == []
+
+    pool.release(first)
+    waiter.join(1)
+    assert acquired == [first]
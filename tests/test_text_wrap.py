@@ -0,0 +1,68 @@
+import pytest
+
+try:
+    import cairo  # type: ignore
+except Exception:  # pragma: no cover - optional dependency missing
+    cairo = None
+
+if cairo is not None:  # pragma: no branch - conditional import for optional dependency
+    import draw_card
+    import layout
+    from draw_card import wrapText
+else:  # pragma: no cover - only triggered when cairo is missing
+    draw_card = None
+    layout = None
+    wrapText = None
+
+
+def _context():
+    dpi = layout.SINGLE_CARD_DPI
+    ctx = cairo.Context(layout.get_single_card_surface(dpi))
+    ctx.set_matrix(layout.get_single_card_matrix(dpi))
+    ctx.select_font_face('serif')
+    ctx.set_font_size(layout.cardTextH)
+    return ctx
+
+
+@pytest.mark.skipif(cairo is None, reason="pycairo is not available")
+def test_wrapped_lines_fit_within_the_text_box():
+    ctx = _context()
+    text = ' '.join(['palabra'] * 60)
+
+    lines = wrapText(ctx, text, layout.cardTextW, layout.cardTextH)
+
+    assert len(lines) > 1
+    assert ' '.join(line for line, _ in lines) == text
+    for line, _ in lines:
+        assert ctx.text_extents(line).width <= layout.cardTextW + 1e-6
+
+
+@pytest.mark.skipif(cairo is None, reason="pycairo is not available")
+def test_paragraphs_use_wider_spacing_and_results_are_memoised():
+    ctx = _context()
+    lineHeight = layout.cardTextH
+
+    lines = wrapText(ctx, 'first\nsecond', layout.cardTextW, lineHeight)
+
+    assert lines == (('first', 0.0), ('second', pytest.approx(lineHeight * 1.4)))
+    assert wrapText(ctx, 'first\nsecond', layout.cardTextW, lineHeight) is lines
+
+
+@pytest.mark.skipif(cairo is None, reason="pycairo is not available")
+def test_overlong_word_gets_its_own_line():
+    ctx = _context()
+
+    lines = wrapText(ctx, 'a ' + 'x' * 200 + ' b', layout.cardTextW, layout.cardTextH)
+
+    assert [line for line, _ in lines] == ['a', 'x' * 200, 'b']
+
+
+@pytest.mark.skipif(cairo is None, reason="pycairo is not available")
+def test_word_metrics_are_bounded(monkeypatch):
+    monkeypatch.setattr(draw_card, '_WORD_METRICS', draw_card.OrderedDict())
+    monkeypatch.setattr(draw_card, '_WORD_METRICS_MAX_ENTRIES', 3)
+    ctx = _context()
+
+    wrapText(ctx, 'uno dos tres cuatro cinco', layout.cardTextW, layout.cardTextH)
+
+    assert [word for _, word in draw_card._WORD_METRICS] == ['tres', 'cuatro', 'cinco']
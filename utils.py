@@ -1,4 +1,13 @@
+import contextlib
+import hashlib
+import os
+import pathlib
 import re
+import threading
+from typing import Dict, Iterator, Optional, Tuple, Union
+
+# Directory, relative to the working directory, holding the source artwork.
+SOURCE_IMAGES_DIR = pathlib.Path('images')
 
 
 def slugify(value: str) -> str:
@@ -7,3 +16,52 @@ def slugify(value: str) -> str:
     value = re.sub(r'\s+', '_', value)
     value = re.sub(r'[^A-Za-z0-9_-]', '', value)
     return value or 'card'
+
+
+@contextlib.contextmanager
+def atomic_write(path: Union[pathlib.Path, str]) -> Iterator[pathlib.Path]:
+    """Yield a temporary path next to ``path`` and move it into place on success.
+
+    Readers, including other worker processes, never see a partial file, and
+    the temporary file is removed when the block raises.
+    """
+    path = pathlib.Path(path)
+    temporary = path.with_name(f'.{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    try:
+        yield temporary
+        os.replace(temporary, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            temporary.unlink()
+        raise
+
+
+_FILE_DIGESTS: Dict[Tuple[str, int, int], str] = {}
+
+
+def file_digest(path: Union[pathlib.Path, str]) -> Optional[str]:
+    """Return the SHA-256 of a file, or ``None`` when it cannot be read.
+
+    Digests are remembered per path, modification time and size so unchanged
+    files are only hashed once per process.
+    """
+    path = pathlib.Path(path)
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+
+    key = (str(path.resolve()), stat.st_mtime_ns, stat.st_size)
+    digest = _FILE_DIGESTS.get(key)
+    if digest is None:
+        hasher = hashlib.sha256()
+        try:
+            with path.open('rb') as source:
+                for block in iter(lambda: source.read(1024 * 1024), b''):
+                    hasher.update(block)
+        except OSError:
+            return None
+        digest = hasher.hexdigest()
+        _FILE_DIGESTS[key] = digest
+
+    return digest